@@ -0,0 +1,90 @@
+"""
+Compare the pandas SQL loader with the typed fast path on a synthetic catalogue.
+
+Run from the repository root: `python -m benchmarks.bench_loader [rows]`
+"""
+
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from src.aggregation import BASE_QUERY_PATH, COMPACT_BOOK_DTYPES
+from src.fetching import SQLiteClient
+
+DEFAULT_ROWS = 500_000
+REPEATS = 3
+
+
+def create_catalogue(db_path: Path, rows: int) -> None:
+    rng = random.Random(0)
+    authors = [f"Autor {i}" for i in range(rows // 20 + 1)]
+    publishers = [f"Wydawca {i}" for i in range(200)]
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            "CREATE TABLE book (title TEXT, author TEXT, publisher TEXT, "
+            "callnumber TEXT, quantity INTEGER)"
+        )
+        connection.executemany(
+            "INSERT INTO book VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    f"Tytuł książki {i}",
+                    rng.choice(authors),
+                    rng.choice(publishers),
+                    f"{chr(65 + i % 26)}{i // 26 // 1000 + 1}/"
+                    f"{i // 26 // 100 % 10 + 1}-{i // 26 % 100:03d}",
+                    rng.randint(1, 30),
+                )
+                for i in range(rows)
+            ),
+        )
+    connection.close()
+
+
+def best_time(load: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "catalogue.sqlite"
+        config_path = Path(tmp_dir) / "config.json"
+        config_path.write_text(json.dumps({"db": {"path": str(db_path)}}))
+        create_catalogue(db_path, rows)
+
+        with SQLiteClient(config_path) as db:
+            pandas_time = best_time(lambda: db.dataframe_from_sql_file(BASE_QUERY_PATH))
+            typed_time = best_time(
+                lambda: db.typed_dataframe_from_sql_file(
+                    BASE_QUERY_PATH, COMPACT_BOOK_DTYPES
+                )
+            )
+            pandas_memory = db.dataframe_from_sql_file(BASE_QUERY_PATH).memory_usage(
+                deep=True
+            )
+            typed_memory = db.typed_dataframe_from_sql_file(
+                BASE_QUERY_PATH, COMPACT_BOOK_DTYPES
+            ).memory_usage(deep=True)
+
+    print(f"rows: {rows}")
+    print(
+        f"pandas read_sql_query: {pandas_time:.3f} s, {pandas_memory.sum() / 2**20:.1f} MiB"
+    )
+    print(
+        f"typed fast path:       {typed_time:.3f} s, {typed_memory.sum() / 2**20:.1f} MiB"
+    )
+    print(f"speedup: {pandas_time / typed_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
@@ -3,21 +3,47 @@ from __future__ import annotations
 import operator
 import re
 from abc import ABC, abstractmethod
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 from dataclasses import astuple, dataclass
-from functools import partial, reduce
+from functools import cached_property, lru_cache, reduce
+from itertools import chain, repeat
 from pathlib import Path
-from typing import TypedDict, cast
+from typing import Any, Callable, Hashable, Iterator, Sequence, TypedDict, cast
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 from openpyxl.styles import Alignment, Font
 from openpyxl.worksheet.worksheet import Worksheet
 
-from src.fetching import SQLiteClient
+from src.caching import ParsedCallnumberCache
+from src.fetching import TEXT_DTYPE, SQLiteClient
 from src.utils import AppError, arg_tuple_not_none
 
 INPUT_PARTS_SEPARATOR = ";"
 INPUT_RANGE_SEPARATOR = "--"
+QUERY_CACHE_SIZE = 128
+VALIDATION_CACHE_SIZE = 64
+DB_VERSION_ATTR = "db_version"
+BASE_QUERY_PATH = "src/basequery.sql"
+CHUNK_SIZE = 50_000
+# explicit dtypes of the book columns, applied while streaming in chunks
+BOOK_DTYPES = {
+    "title": "string",
+    "author": "string",
+    "publisher": "string",
+    "callnumber": "string",
+    "quantity": "Int32",
+}
+# compact dtypes for full loads: repetitive texts become categories
+COMPACT_BOOK_DTYPES = {
+    "title": TEXT_DTYPE,
+    "author": "category",
+    "publisher": "category",
+    "callnumber": TEXT_DTYPE,
+    "quantity": "int32",
+}
 
 
 class CallnumberParseError(AppError): ...
@@ -30,6 +56,95 @@ CallnumberTuple = namedtuple(
     "CallnumberTuple", ["room_", "bookcase_", "shelf_", "book_"]
 )
 
+# rooms are encoded as integers in the parsed columns; -1 marks an unparsable value
+ROOM_CODES = {chr(code): code - ord("A") for code in range(ord("A"), ord("Z") + 1)}
+ROOM_LETTERS = {code: room for room, code in ROOM_CODES.items()}
+MISSING_CODE = -1
+
+BoolArray = npt.NDArray[np.bool_]
+KeyArray = npt.NDArray[np.int64]
+PositionArray = npt.NDArray[np.intp]
+
+# packed key layout (most significant first): room | bookcase | shelf | book;
+# the all-ones value of a field is reserved as an upper bound for query values
+KEY_FIELD_BITS = (5, 20, 20, 10)
+KEY_FIELD_SHIFTS = tuple(sum(KEY_FIELD_BITS[i + 1 :]) for i in range(4))
+KEY_FIELD_MAX = tuple((1 << bits) - 1 for bits in KEY_FIELD_BITS)
+
+
+def pack_callnumber_key(*values: int) -> int:
+    """
+    Pack up to four callnumber parts (room code first) into a sortable integer;
+    missing trailing parts are zero and values above the field range are clamped
+    """
+    key = 0
+    for value, shift, maxvalue in zip(values, KEY_FIELD_SHIFTS, KEY_FIELD_MAX):
+        key |= min(int(value), maxvalue) << shift
+    return key
+
+
+def unpack_callnumber_key(key: int) -> tuple[int, int, int, int]:
+    room, bookcase, shelf, book = (
+        (key >> shift) & maxvalue
+        for shift, maxvalue in zip(KEY_FIELD_SHIFTS, KEY_FIELD_MAX)
+    )
+    return room, bookcase, shelf, book
+
+
+def pack_callnumber_keys(parts: pd.DataFrame) -> KeyArray:
+    """
+    Vectorized `pack_callnumber_key` over the columns from `_parse_df_callnumber`;
+    unparsable rows get a negative key
+    """
+    columns = [
+        parts[field].to_numpy(dtype=np.int64) for field in CallnumberTuple._fields
+    ]
+    keys = np.zeros(len(parts), dtype=np.int64)
+    for column, shift in zip(columns, KEY_FIELD_SHIFTS):
+        keys |= column << shift
+    keys[np.logical_or.reduce([column < 0 for column in columns])] = MISSING_CODE
+    return keys
+
+
+def key_overflow(parts: pd.DataFrame) -> BoolArray:
+    """Rows with parts that do not fit into the packed key layout"""
+    return np.logical_or.reduce(
+        [
+            parts[field].to_numpy() >= maxvalue
+            for field, maxvalue in zip(CallnumberTuple._fields, KEY_FIELD_MAX)
+        ]
+    )
+
+
+# SQL expressions decomposing the callnumber text into the parts of CallnumberTuple
+CALLNUMBER_SQL_PARTS = CallnumberTuple(
+    room_="upper(substr(callnumber, 1, 1))",
+    bookcase_="CAST(substr(callnumber, 2, instr(callnumber, '/') - 2) AS INTEGER)",
+    shelf_=(
+        "CAST(substr(callnumber, instr(callnumber, '/') + 1, "
+        "instr(callnumber, '-') - instr(callnumber, '/') - 1) AS INTEGER)"
+    ),
+    book_="CAST(substr(callnumber, instr(callnumber, '-') + 1) AS INTEGER)",
+)
+# generated columns of `book` with the expressions above, added by `src.migration`
+CALLNUMBER_INDEX_NAME = "book_callnumber_parts"
+CALLNUMBER_INDEXED_PARTS = CallnumberTuple(
+    room_="callnumber_room",
+    bookcase_="callnumber_bookcase",
+    shelf_="callnumber_shelf",
+    book_="callnumber_book",
+)
+
+SqlPredicate = tuple[str, list[str | int]]
+
+
+def _sql_compare_lexicographic(
+    columns: tuple[str, ...], values: tuple[int, ...], op: str
+) -> SqlPredicate:
+    """SQL row-value comparison `(columns) op (values)`"""
+    placeholders = ", ".join("?" * len(values))
+    return f"({', '.join(columns)}) {op} ({placeholders})", list(values)
+
 
 class CallnumberGroupsDict(TypedDict):
     room: str
@@ -43,6 +158,38 @@ class Condition(ABC):
     def assess(self, callnumber_tuple: CallnumberTuple) -> bool:
         pass
 
+    @abstractmethod
+    def mask(self, parts: pd.DataFrame) -> BoolArray:
+        """Vectorized `assess` over the columns from `_parse_df_callnumber`"""
+        pass
+
+    @abstractmethod
+    def key_range(self) -> tuple[int, int]:
+        """Half-open interval of packed keys satisfying the condition"""
+        pass
+
+    @abstractmethod
+    def to_sql(self, parts: CallnumberTuple = CALLNUMBER_SQL_PARTS) -> SqlPredicate:
+        """Parameterized SQL predicate over the given callnumber part expressions"""
+        pass
+
+    @abstractmethod
+    def to_text(self) -> str:
+        """Query text parsing back into an equivalent condition"""
+        pass
+
+
+def _compare_lexicographic(
+    values: tuple,
+    columns: list[np.ndarray],
+    op: Callable[[Any, Any], Any],
+) -> BoolArray:
+    """Row-wise equivalent of `op(values, tuple(columns))` with tuple semantics"""
+    result = np.full(len(columns[0]), op(len(values), len(columns)), dtype=bool)
+    for value, column in reversed(list(zip(values, columns))):
+        result = np.where(column != value, op(value, column), result)
+    return result
+
 
 @dataclass
 class CallnumberCondition(Condition):
@@ -69,21 +216,53 @@ class CallnumberCondition(Condition):
         re.compile(r"^(?P<room>[A-Z])$"),
     ]
 
-    @property
+    @cached_property
     def maxlevel(self) -> int:
-        if self.book:
+        if self.book is not None:
             return 4
-        if self.shelf:
+        if self.shelf is not None:
             return 3
-        if self.bookcase:
+        if self.bookcase is not None:
             return 2
         return 1
 
+    @cached_property
+    def prefix(self) -> tuple:
+        """The given parts of the callnumber, room first"""
+        return astuple(self)[: self.maxlevel]
+
     @arg_tuple_not_none
     def assess(self, callnumber_tuple: CallnumberTuple) -> bool:
-        field_values = callnumber_tuple
-        condition_values = astuple(self)
-        return condition_values[: self.maxlevel] == field_values[: self.maxlevel]
+        return self.prefix == callnumber_tuple[: self.maxlevel]
+
+    def mask(self, parts: pd.DataFrame) -> BoolArray:
+        result = parts["room_"].to_numpy() == ROOM_CODES[self.room]
+        for field, value in zip(CallnumberTuple._fields[1:], self.prefix[1:]):
+            result &= parts[field].to_numpy() == value
+        return result
+
+    @cached_property
+    def _key_range(self) -> tuple[int, int]:
+        start = pack_callnumber_key(ROOM_CODES[self.room], *self.prefix[1:])
+        return start, start + (1 << KEY_FIELD_SHIFTS[self.maxlevel - 1])
+
+    def key_range(self) -> tuple[int, int]:
+        return self._key_range
+
+    def to_sql(self, parts: CallnumberTuple = CALLNUMBER_SQL_PARTS) -> SqlPredicate:
+        clauses = [f"{column} = ?" for column in parts[: self.maxlevel]]
+        return " AND ".join(clauses), list(self.prefix)
+
+    def to_text(self) -> str:
+        text = self.room
+        for separator, value, width in zip(("", "/", "-"), self.prefix[1:], (1, 1, 3)):
+            text += f"{separator}{value:0{width}d}"
+        return text
+
+    @classmethod
+    def from_key(cls, key: int, maxlevel: int) -> CallnumberCondition:
+        room_code, *values = unpack_callnumber_key(key)
+        return CallnumberCondition(ROOM_LETTERS[room_code], *values[: maxlevel - 1])
 
     @classmethod
     def from_text(cls, text: str) -> CallnumberCondition:
@@ -98,12 +277,19 @@ class CallnumberCondition(Condition):
         if result is None:
             return None
         groups = cast(CallnumberGroupsDict, result.groupdict())
-        return CallnumberCondition(
+        condition = CallnumberCondition(
             room=groups["room"],
             bookcase=groups.get("bookcase"),
             shelf=groups.get("shelf"),
             book=groups.get("book"),
         )
+        # parts beyond the packed key fields cannot be looked up exactly
+        if any(
+            value is not None and value > maxvalue
+            for value, maxvalue in zip(astuple(condition)[1:], KEY_FIELD_MAX[1:])
+        ):
+            raise CallnumberParseError(f"Wartość poza obsługiwanym zakresem: {text}")
+        return condition
 
     @classmethod
     def parse_full(cls, text: str) -> CallnumberTuple | tuple[None, None, None, None]:
@@ -133,36 +319,283 @@ class CallnumberRangeCondition(Condition):
     def room(self) -> str:
         return self.start.room
 
+    @cached_property
+    def start_bound(self) -> tuple:
+        return self.start.prefix[1:]
+
+    @cached_property
+    def end_bound(self) -> tuple:
+        return self.end.prefix[1:]
+
     @arg_tuple_not_none
     def assess(self, callnumber_tuple: CallnumberTuple) -> bool:
-        field_values = callnumber_tuple[1:]
-        _result_left = (
-            astuple(self.start)[1 : self.start.maxlevel]
-            <= field_values[: self.start.maxlevel]
-        )
-        _result_right = (
-            astuple(self.end)[1 : self.end.maxlevel]
-            >= field_values[: self.end.maxlevel]
-        )
+        _result_left = self.start_bound <= callnumber_tuple[1 : self.start.maxlevel + 1]
+        _result_right = self.end_bound >= callnumber_tuple[1 : self.end.maxlevel + 1]
         _result_room = self.room == callnumber_tuple.room_
         if _result_room and _result_left and _result_right:
             return True
         return False
 
+    def mask(self, parts: pd.DataFrame) -> BoolArray:
+        field_columns = [
+            parts[field].to_numpy() for field in CallnumberTuple._fields[1:]
+        ]
+        _result_left = _compare_lexicographic(
+            self.start_bound, field_columns[: self.start.maxlevel], operator.le
+        )
+        _result_right = _compare_lexicographic(
+            self.end_bound, field_columns[: self.end.maxlevel], operator.ge
+        )
+        _result_room = parts["room_"].to_numpy() == ROOM_CODES[self.room]
+        return _result_room & _result_left & _result_right
+
+    @cached_property
+    def _key_range(self) -> tuple[int, int]:
+        room_code = ROOM_CODES[self.room]
+        start = pack_callnumber_key(room_code, *self.start_bound)
+        end = pack_callnumber_key(room_code, *self.end_bound)
+        # only a full callnumber closes the range inclusively
+        if self.end.maxlevel == 4:
+            end += 1
+        return start, max(start, end)
+
+    def key_range(self) -> tuple[int, int]:
+        return self._key_range
+
+    def to_sql(self, parts: CallnumberTuple = CALLNUMBER_SQL_PARTS) -> SqlPredicate:
+        clauses = [f"{parts.room_} = ?"]
+        params: list[str | int] = [self.room]
+        field_columns = tuple(parts[1:])
+        if start_values := self.start_bound:
+            clause, values = _sql_compare_lexicographic(
+                field_columns[: len(start_values)], start_values, ">="
+            )
+            clauses.append(clause)
+            params.extend(values)
+        end_values = self.end_bound
+        if not end_values:
+            # an end given as a bare room does not close any range
+            return "0", []
+        clause, values = _sql_compare_lexicographic(
+            field_columns[: len(end_values)],
+            end_values,
+            "<=" if self.end.maxlevel == 4 else "<",
+        )
+        clauses.append(clause)
+        params.extend(values)
+        return " AND ".join(clauses), params
+
+    def to_text(self) -> str:
+        return f"{self.start.to_text()}{INPUT_RANGE_SEPARATOR}{self.end.to_text()}"
+
+
+def _significant_level(key: int) -> int:
+    """The level of the last non-zero part of the key; a bare room is level 1"""
+    _, *values = unpack_callnumber_key(key)
+    return max((level for level, value in enumerate(values, 2) if value), default=1)
+
+
+def condition_from_key_range(start: int, end: int) -> Condition:
+    """The simplest condition covering exactly the non-empty half-open key range"""
+    for level, shift in enumerate(KEY_FIELD_SHIFTS, 1):
+        span = 1 << shift
+        if start % span == 0 and end - start == span:
+            return CallnumberCondition.from_key(start, level)
+
+    room_code = unpack_callnumber_key(start)[0]
+    start_condit = CallnumberCondition.from_key(start, _significant_level(start))
+    if unpack_callnumber_key(end)[0] != room_code:
+        # open to the end of the room; stored bookcases are all below the field max
+        end_condit = CallnumberCondition(ROOM_LETTERS[room_code], KEY_FIELD_MAX[1])
+    elif unpack_callnumber_key(end)[3]:
+        end_condit = CallnumberCondition.from_key(end - 1, 4)
+    else:
+        end_condit = CallnumberCondition.from_key(end, max(2, _significant_level(end)))
+    return CallnumberRangeCondition(start=start_condit, end=end_condit)
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledQuery:
+    """A parsed query with the key bounds of its conditions precomputed"""
+
+    query: str
+    conditions: tuple[Condition, ...]
+    key_ranges: KeyArray
+
+    @property
+    def simplified(self) -> str:
+        return INPUT_PARTS_SEPARATOR.join(
+            condit.to_text() for condit in self.conditions
+        )
+
+    def to_sql(self, parts: CallnumberTuple = CALLNUMBER_SQL_PARTS) -> SqlPredicate:
+        clauses: list[str] = []
+        params: list[str | int] = []
+        for condit in self.conditions:
+            clause, values = condit.to_sql(parts)
+            clauses.append(f"({clause})")
+            params.extend(values)
+        return " OR ".join(clauses), params
+
+
+class CallnumberIndex:
+    """Catalogue sorted by packed callnumber keys for binary-search lookups"""
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        callnumber_col: str = "callnumber",
+        parts: pd.DataFrame | None = None,
+    ) -> None:
+        """`parts` are the precomputed result of `decompose`, if available"""
+        if parts is None:
+            parts = self.decompose(df, callnumber_col)
+        keys = parts["key_"].to_numpy(dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.frame = pd.concat([df, parts.set_axis(df.index)], axis=1).iloc[order]
+        self.keys: KeyArray = keys[order]
+        # row positions in `df` of the sorted rows
+        self.order: PositionArray = order
+
+    @staticmethod
+    def decompose(df: pd.DataFrame, callnumber_col: str = "callnumber") -> pd.DataFrame:
+        """Decomposed callnumber columns together with the packed `key_` column"""
+        parts = CallnumberFilteringService._parse_df_callnumber(df, callnumber_col)
+        if (overflow := key_overflow(parts)).any():
+            raise DBValidationError(
+                "Sygnatury w bazie danych poza obsługiwanym zakresem: "
+                f"{df.loc[overflow, callnumber_col].tolist()}"
+            )
+        return parts.assign(key_=pack_callnumber_keys(parts))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def slices(self, key_ranges: KeyArray) -> tuple[PositionArray, PositionArray]:
+        """Row position bounds of every key range, found by binary search"""
+        return (
+            np.searchsorted(self.keys, key_ranges[:, 0], side="left"),
+            np.searchsorted(self.keys, key_ranges[:, 1], side="left"),
+        )
+
+    @staticmethod
+    def _positions(starts: PositionArray, ends: PositionArray) -> PositionArray:
+        if len(starts) == 1:
+            return np.arange(starts[0], ends[0])
+        return np.concatenate([np.arange(lo, hi) for lo, hi in zip(starts, ends)])
+
+    def positions(self, key_ranges: KeyArray) -> PositionArray:
+        """
+        Positions of the rows within any of the key ranges;
+        the ranges must be sorted and disjoint, as in a `CompiledQuery`
+        """
+        return self._positions(*self.slices(key_ranges))
+
+    def lookup(self, query: CompiledQuery) -> pd.DataFrame:
+        return self.frame.iloc[self.positions(query.key_ranges)]
+
+    def positions_many(self, queries: Sequence[CompiledQuery]) -> list[PositionArray]:
+        """Resolve all queries with a single binary search over their key ranges"""
+        if not queries:
+            return []
+        starts, ends = self.slices(np.concatenate([q.key_ranges for q in queries]))
+        offsets = np.cumsum([len(query.key_ranges) for query in queries])[:-1]
+        return [
+            self._positions(query_starts, query_ends)
+            for query_starts, query_ends in zip(
+                np.split(starts, offsets), np.split(ends, offsets)
+            )
+        ]
+
+    def lookup_many(self, queries: Sequence[CompiledQuery]) -> list[pd.DataFrame]:
+        return [
+            self.frame.iloc[positions] for positions in self.positions_many(queries)
+        ]
+
 
 class CallnumberFilteringService:
-    # TODO: get_conditions could be a separate function
-    # to first check if the query is valid and then load the dataset
     @classmethod
     def filter(cls, df: pd.DataFrame, query: str) -> pd.DataFrame:
-        query = query.strip().upper()
-        conditions = cls._decompose_query(query)
+        conditions = list(cls.compile(query).conditions)
         df = pd.concat([df, cls._parse_df_callnumber(df)], axis=1)
-        df["_result"] = df[list(CallnumberTuple._fields)].apply(
-            partial(cls.apply_conditions, conditions), axis=1
-        )
+        df["_result"] = cls.apply_masks(conditions, df)
         return df[df["_result"] == True]
 
+    @classmethod
+    def filter_many(
+        cls, df: pd.DataFrame, queries: Sequence[str]
+    ) -> dict[str, pd.DataFrame]:
+        """
+        Same as `filter` for every query; the callnumbers are parsed once and all
+        queries are resolved with one binary search, the rows kept in input order
+        """
+        parts = cls._parse_df_callnumber(df)
+        frame = pd.concat([df, parts], axis=1).assign(_result=True)
+        if key_overflow(parts).any():
+            # such rows have no packed key, only the masks can evaluate them
+            return {
+                query: frame[
+                    cls.apply_masks(list(cls.compile(query).conditions), parts)
+                ]
+                for query in queries
+            }
+        index = CallnumberIndex(
+            pd.DataFrame(index=df.index),
+            parts=parts.assign(key_=pack_callnumber_keys(parts)),
+        )
+        compiled = [cls.compile(query) for query in queries]
+        return {
+            query: frame.iloc[np.sort(index.order[positions])]
+            for query, positions in zip(queries, index.positions_many(compiled))
+        }
+
+    @classmethod
+    def filter_index(cls, index: CallnumberIndex, query: str) -> pd.DataFrame:
+        return index.lookup(cls.compile(query))
+
+    @classmethod
+    def filter_index_many(
+        cls, index: CallnumberIndex, queries: Sequence[str]
+    ) -> dict[str, pd.DataFrame]:
+        """Same as `filter_index` for every query, evaluated in one pass"""
+        compiled = [cls.compile(query) for query in queries]
+        return dict(zip(queries, index.lookup_many(compiled)))
+
+    @classmethod
+    def to_sql(
+        cls, query: str, parts: CallnumberTuple = CALLNUMBER_SQL_PARTS
+    ) -> SqlPredicate:
+        """Compile the query into a parameterized WHERE clause"""
+        return cls.compile(query).to_sql(parts)
+
+    @classmethod
+    def to_indexed_sql(cls, query: str) -> SqlPredicate:
+        """
+        Like `to_sql`, but the conditions are answered by the composite index on the
+        generated columns, and the matching rows are then looked up by callnumber
+        """
+        where, params = cls.to_sql(query, CALLNUMBER_INDEXED_PARTS)
+        return f"callnumber IN (SELECT callnumber FROM book WHERE {where})", params
+
+    @classmethod
+    def compile(cls, query: str) -> CompiledQuery:
+        """Parse the query once; repeated queries are served from an LRU cache"""
+        return cls._compile_normalized(query.strip().upper())
+
+    @staticmethod
+    @lru_cache(maxsize=QUERY_CACHE_SIZE)
+    def _compile_normalized(query: str) -> CompiledQuery:
+        conditions = tuple(
+            CallnumberFilteringService._optimize_conditions(
+                CallnumberFilteringService._decompose_query(query)
+            )
+        )
+        key_ranges = np.array(
+            [condit.key_range() for condit in conditions], dtype=np.int64
+        )
+        key_ranges.flags.writeable = False
+        return CompiledQuery(query, conditions, key_ranges)
+
     @staticmethod
     def _decompose_query(query: str) -> list[Condition]:
         parts = query.split(INPUT_PARTS_SEPARATOR)
@@ -179,6 +612,30 @@ class CallnumberFilteringService:
                 raise CallnumberParseError(f"Nieprawidłowo zdefiniowany zakres: {part}")
         return conditions
 
+    @staticmethod
+    def _optimize_conditions(conditions: list[Condition]) -> list[Condition]:
+        """
+        Merge overlapping, adjacent and subsumed conditions within each room
+        into the minimal list of disjoint conditions, ordered by callnumber
+        """
+        key_ranges = sorted(
+            (start, end)
+            for start, end in (condit.key_range() for condit in conditions)
+            if start < end
+        )
+        if not key_ranges:
+            return conditions[:1]
+
+        merged = [key_ranges[0]]
+        room_shift = KEY_FIELD_SHIFTS[0]
+        for start, end in key_ranges[1:]:
+            last_start, last_end = merged[-1]
+            if start <= last_end and start >> room_shift == last_start >> room_shift:
+                merged[-1] = (last_start, max(last_end, end))
+            else:
+                merged.append((start, end))
+        return [condition_from_key_range(start, end) for start, end in merged]
+
     @staticmethod
     def apply_conditions(conditions: list[Condition], cols_obj: pd.Series) -> bool:
         return reduce(
@@ -186,14 +643,26 @@ class CallnumberFilteringService:
             (condit.assess(CallnumberTuple(*cols_obj.values)) for condit in conditions),
         )
 
+    @staticmethod
+    def apply_masks(conditions: list[Condition], parts: pd.DataFrame) -> BoolArray:
+        return np.logical_or.reduce([condit.mask(parts) for condit in conditions])
+
     @classmethod
     def _parse_df_callnumber(
         cls, df: pd.DataFrame, callnumber_col: str = "callnumber"
     ) -> pd.DataFrame:
-        """Return columns with decomposed parts of a callnumber"""
-        return pd.DataFrame(
-            df[callnumber_col].map(CallnumberCondition.parse_full).tolist()
+        """Return integer columns with decomposed parts of a callnumber"""
+        groups = (
+            df[callnumber_col]
+            .astype(str)
+            .str.upper()
+            .str.extract(CallnumberCondition.PATTERN)
         )
+        parts = pd.DataFrame(index=df.index)
+        parts["room_"] = groups["room"].map(ROOM_CODES)
+        for group in ("bookcase", "shelf", "book"):
+            parts[f"{group}_"] = pd.to_numeric(groups[group])
+        return parts.fillna(MISSING_CODE).astype("int64")
 
 
 EXPORT_COLUMN_NAMES = {
@@ -205,13 +674,115 @@ EXPORT_COLUMN_NAMES = {
 }
 
 
+# a config file to read the database path from, or an already configured client
+DataSource = Path | SQLiteClient
+
+
+def _format_counts(counts: pd.Series) -> str:
+    return ", ".join(f"{value} (x{count})" for value, count in counts.items())
+
+
+def _hash_callnumbers(df: pd.DataFrame) -> npt.NDArray[np.uint64]:
+    hashes = pd.util.hash_pandas_object(df["callnumber"], index=False)
+    return cast(npt.NDArray[np.uint64], hashes.to_numpy())
+
+
 class DataCollectorService:
+    # data versions (see `get_data`) already known to pass `validate_data`
+    _validated_versions: OrderedDict[Hashable, None] = OrderedDict()
+
     @staticmethod
-    def get_data(config_path: Path) -> pd.DataFrame:
-        with SQLiteClient(config_path) as db:
-            books_df = db.dataframe_from_sql_file("src/basequery.sql")
+    @contextmanager
+    def _open(source: DataSource) -> Iterator[SQLiteClient]:
+        """Reuse a session client as is, or open one for the duration of a call"""
+        if isinstance(source, SQLiteClient):
+            source.ensure_connected()
+            yield source
+            return
+        with SQLiteClient(source) as db:
+            yield db
+
+    @classmethod
+    def get_data(cls, source: DataSource, query: str | None = None) -> pd.DataFrame:
+        """
+        Load the books; with a query only the matching rows are fetched, through the
+        callnumber index when the database has been migrated. The data version is
+        attached only if the database did not change during the load, so that rows
+        of one version are never cached under another
+        """
+        with cls._open(source) as db:
+            version = db.version
+            where: str | None = None
+            params: list[str | int] = []
+            if query and db.has_index(CALLNUMBER_INDEX_NAME):
+                where, params = CallnumberFilteringService.to_indexed_sql(query)
+            elif query:
+                where, params = CallnumberFilteringService.to_sql(query)
+            books_df = db.typed_dataframe_from_sql_file(
+                BASE_QUERY_PATH, COMPACT_BOOK_DTYPES, where=where, params=params
+            )
+            if db.version == version:
+                books_df.attrs[DB_VERSION_ATTR] = (version, where, tuple(params))
         return books_df
 
+    @classmethod
+    def get_filtered_data_chunked(
+        cls, source: DataSource, query: str, chunksize: int = CHUNK_SIZE
+    ) -> pd.DataFrame:
+        """
+        Validate and filter the whole catalogue chunk by chunk, so that peak memory
+        is bounded by the chunk size and the result rather than by the table size;
+        uniqueness across chunks is checked on hashes of the stored callnumbers
+        """
+        conditions = list(CallnumberFilteringService.compile(query).conditions)
+        seen_hashes: list[npt.NDArray[np.uint64]] = [np.empty(0, dtype=np.uint64)]
+        results: list[pd.DataFrame] = [pd.DataFrame(columns=[*BOOK_DTYPES])]
+        offset = 0
+        with cls._open(source) as db:
+            for chunk in db.iter_dataframes_from_sql_file(
+                BASE_QUERY_PATH, chunksize, dtype=BOOK_DTYPES
+            ):
+                chunk.index += offset
+                offset += len(chunk)
+                cls.validate_data(chunk)
+                seen_hashes.append(_hash_callnumbers(chunk))
+                parts = CallnumberIndex.decompose(chunk)
+                mask = CallnumberFilteringService.apply_masks(conditions, parts)
+                results.append(pd.concat([chunk, parts], axis=1)[mask])
+
+            hashes, counts = np.unique(np.concatenate(seen_hashes), return_counts=True)
+            if (counts > 1).any():
+                duplicated = cls._count_hashed_callnumbers(
+                    db, chunksize, hashes[counts > 1]
+                )
+                raise DBValidationError(
+                    f"Sygnatury w bazie danych nie są unikalne ({len(duplicated)}): "
+                    f"{_format_counts(duplicated)}"
+                )
+        return pd.concat(results[1:]) if len(results) > 1 else results[0]
+
+    @staticmethod
+    def _count_hashed_callnumbers(
+        db: SQLiteClient, chunksize: int, hashes: npt.NDArray[np.uint64]
+    ) -> pd.Series:
+        """Counts of the stored callnumbers with the given hashes, in a second scan"""
+        matches = [pd.Series(dtype="string")]
+        for chunk in db.iter_dataframes_from_sql_file(
+            BASE_QUERY_PATH,
+            chunksize,
+            dtype={"callnumber": BOOK_DTYPES["callnumber"]},
+            columns=["callnumber"],
+        ):
+            matches.append(
+                chunk["callnumber"][np.isin(_hash_callnumbers(chunk), hashes)]
+            )
+        return pd.concat(matches).value_counts(sort=False)
+
+    @staticmethod
+    def compile_query(query: str) -> CompiledQuery:
+        """Parse the query up front, so that it is validated before any data loads"""
+        return CallnumberFilteringService.compile(query)
+
     @staticmethod
     def validate_unique_callnumbers(df: pd.DataFrame) -> None:
         if not df["callnumber"].is_unique:
@@ -219,29 +790,125 @@ class DataCollectorService:
 
     @staticmethod
     def validate_callnumber_format(df: pd.DataFrame) -> None:
-        results = df["callnumber"].apply(
-            lambda cn: bool(CallnumberCondition.PATTERN.match(cn))
-        )
+        results = df["callnumber"].str.match(CallnumberCondition.PATTERN, na=False)
         if not results.all():
             invalid_values = df.loc[~results, "callnumber"].tolist()
             raise DBValidationError(
                 f"Nieprawidłowe sygnatury w bazie danych: {invalid_values}"
             )
 
+    @classmethod
+    def validate_data(cls, df: pd.DataFrame) -> None:
+        """
+        Check format and uniqueness of the callnumbers in a single scan,
+        reporting every offender; the verdict is remembered per data version
+        """
+        version = df.attrs.get(DB_VERSION_ATTR)
+        if version is not None and version in cls._validated_versions:
+            cls._validated_versions.move_to_end(version)
+            return
+
+        counts = df["callnumber"].value_counts(dropna=False, sort=False)
+        valid = (
+            pd.Series(counts.index, dtype="string")
+            .str.match(CallnumberCondition.PATTERN, na=False)
+            .to_numpy(dtype=bool)
+        )
+        errors = []
+        if not valid.all():
+            invalid = counts[~valid]
+            errors.append(
+                f"Nieprawidłowe sygnatury w bazie danych ({invalid.sum()}): "
+                f"{_format_counts(invalid)}"
+            )
+        if (duplicated := counts[counts > 1]).any():
+            errors.append(
+                f"Sygnatury w bazie danych nie są unikalne ({len(duplicated)}): "
+                f"{_format_counts(duplicated)}"
+            )
+        if errors:
+            raise DBValidationError("\n".join(errors))
+
+        if version is not None:
+            cls._validated_versions[version] = None
+            if len(cls._validated_versions) > VALIDATION_CACHE_SIZE:
+                cls._validated_versions.popitem(last=False)
+
     @staticmethod
-    def filter_data(df: pd.DataFrame, query: str) -> pd.DataFrame:
-        """A simplified filtering solution; works fast only with small databases"""
-        return CallnumberFilteringService.filter(df, query)
+    def decompose_callnumbers(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Parsed callnumber columns and keys; for a full catalogue load they are
+        memory-mapped from a sidecar cache next to the database when up to date
+        """
+        version = df.attrs.get(DB_VERSION_ATTR)
+        if version is None or version[1] is not None:
+            return CallnumberIndex.decompose(df)
+
+        db_version = version[0]
+        cache = ParsedCallnumberCache(Path(db_version[0]))
+        columns = [*CallnumberTuple._fields, "key_"]
+        if (parts := cache.load(db_version, len(df), columns)) is not None:
+            return parts.set_axis(df.index)
+        parts = CallnumberIndex.decompose(df)
+        cache.store(db_version, parts)
+        return parts
+
+    @classmethod
+    def build_index(cls, df: pd.DataFrame) -> CallnumberIndex:
+        return CallnumberIndex(df, parts=cls.decompose_callnumbers(df))
 
     @staticmethod
-    def get_callnumber_list(df: pd.DataFrame) -> list[str]:
-        callnumbers = (
-            df.sort_values("callnumber").loc[:, ["callnumber", "quantity"]].values,
-        )[0]
-        result = []
-        for callnumber, quantity in callnumbers:
-            result.extend([callnumber] * int(quantity))
-        return result
+    def filter_data(data: pd.DataFrame | CallnumberIndex, query: str) -> pd.DataFrame:
+        """
+        Vectorized filtering over the decomposed callnumber columns;
+        an indexed catalogue is filtered with binary search instead of a full scan
+        """
+        if isinstance(data, CallnumberIndex):
+            return CallnumberFilteringService.filter_index(data, query)
+        return CallnumberFilteringService.filter(data, query)
+
+    @classmethod
+    def filter_data_many(
+        cls, data: pd.DataFrame | CallnumberIndex, queries: Sequence[str]
+    ) -> dict[str, pd.DataFrame]:
+        """
+        Filter the data with many queries at once (e.g. a sticker set per room),
+        parsing the catalogue only once; the result of every query is the same as
+        that of `filter_data`
+        """
+        if isinstance(data, CallnumberIndex):
+            return CallnumberFilteringService.filter_index_many(data, queries)
+        return CallnumberFilteringService.filter_many(data, queries)
+
+    @staticmethod
+    def validate_quantities(df: pd.DataFrame) -> None:
+        if (missing := df["quantity"].isna()).any():
+            raise DBValidationError(
+                "Brak liczby sztuk w bazie danych: "
+                f"{df.loc[missing, 'callnumber'].tolist()}"
+            )
+
+    @classmethod
+    def get_callnumber_list(cls, df: pd.DataFrame) -> list[str]:
+        cls.validate_quantities(df)
+        sorted_df = df.sort_values("callnumber")
+        quantities = sorted_df["quantity"].to_numpy(dtype=np.int64).clip(min=0)
+        return np.repeat(sorted_df["callnumber"].to_numpy(), quantities).tolist()
+
+    @classmethod
+    def iter_callnumbers(cls, df: pd.DataFrame) -> Iterator[str]:
+        """
+        Lazy `get_callnumber_list`, yielding the sticker texts in sort order;
+        the quantities are validated up front, not once iteration starts
+        """
+        cls.validate_quantities(df)
+        sorted_df = df.sort_values("callnumber")
+        return chain.from_iterable(
+            repeat(callnumber, max(int(quantity), 0))
+            for callnumber, quantity in zip(
+                sorted_df["callnumber"], sorted_df["quantity"]
+            )
+        )
 
     @classmethod
     def get_excel_export(cls, df: pd.DataFrame, output_path: Path) -> None:
@@ -273,3 +940,32 @@ class DataCollectorService:
                     max_length = max(max_length, len(str(cell.value)))
             adjusted_width = max_length + 2
             worksheet.column_dimensions[column].width = adjusted_width
+
+
+class CatalogueSnapshot:
+    """
+    The full catalogue loaded, validated and indexed once for a session; it is
+    reloaded only when `PRAGMA data_version` or the database file shows a change
+    """
+
+    def __init__(self, db: SQLiteClient) -> None:
+        self.db = db
+        self._index: CallnumberIndex | None = None
+        self._version: tuple[Hashable, int] | None = None
+
+    def _current_version(self) -> tuple[Hashable, int]:
+        file_version = self.db.version
+        if self._version is not None and file_version != self._version[0]:
+            # the file may have been replaced, which an open connection would not see
+            self.db.close()
+        self.db.ensure_connected()
+        return file_version, self.db.data_version()
+
+    def index(self) -> CallnumberIndex:
+        version = self._current_version()
+        if self._index is None or version != self._version:
+            data = DataCollectorService.get_data(self.db)
+            DataCollectorService.validate_data(data)
+            self._index = DataCollectorService.build_index(data)
+            self._version = version
+        return self._index
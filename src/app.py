@@ -19,7 +19,7 @@ def process(parent: MainWindow) -> None:
             f"Maksymalna pozycja pierwszej komórki to {config.max_cell_ordinal}"
         )
     config.set_initial_cell_ordinal(init_cell)
-    pdf_creator = PdfCreator(config)
+    pdf_creator = PdfCreator(config, pool=parent.get_application().sticker_pool)
 
     # template ratio warning
     is_valid, (sticker_ratio, template_ratio) = validate_template_ratio(pdf_creator)
@@ -28,26 +28,28 @@ def process(parent: MainWindow) -> None:
     query = parent.query_entry.get_text()
     if not query:
         raise CallnumberParseError("Puste zapytanie")
+    compiled_query = dcs.compile_query(query)
 
-    # get and validate data
-    data = dcs.get_data(CONFIG_PATH)
-    dcs.validate_unique_callnumbers(data)
-    dcs.validate_callnumber_format(data)
+    # get the validated catalogue, reloaded only when the database has changed
+    catalogue = parent.get_application().catalogue.index()
 
     # process data
-    filtered_data = dcs.filter_data(data, query)
-    contents = dcs.get_callnumber_list(filtered_data)
+    filtered_data = dcs.filter_data(catalogue, query)
+    contents = dcs.iter_callnumbers(filtered_data)
 
     # generate files
     info = pdf_creator.generate_pdf(contents, parent.pdf_path)
     dcs.get_excel_export(filtered_data, parent.excel_path)
 
     # info
+    volumes = f"Liczba plików PDF: {info['volumes']}\n" if "volumes" in info else ""
     parent.show_info(
         "Wygenerowano pliki",
         f"Arkusz z naklejkami zajął {info['total_pages']} stron.\n"
+        f"{volumes}"
         f"Zaczęto od pola nr {init_cell} na pierwszej stronie,\n"
-        f"na ostatniej stronie zostaje {info['left_last_page']} pól.\n\n"
+        f"na ostatniej stronie zostaje {info['left_last_page']} pól.\n"
+        f"Uproszczone zapytanie: {compiled_query.simplified}\n\n"
         "W skoroszycie znajduje się wykaz książek odpowiadających naklejkom.",
     )
     if not is_valid:
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Sequence, TypeVar
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+PARSED_CACHE_SUFFIX = ".callnumbers"
+PARSED_CACHE_FORMAT = 1
+PAGE_CACHE_FORMAT = 1
+
+T = TypeVar("T")
+
+
+def _atomic_write(path: Path, write: Any) -> None:
+    """Write through a temporary file, so readers never see a partial file"""
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "wb") as f:
+        write(f)
+    os.replace(temp_path, path)
+
+
+class ParsedCallnumberCache:
+    """
+    Sidecar files next to the database with the decomposed callnumber columns
+    of the full catalogue, valid for one database version and row count
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        base_name = f"{db_path.name}{PARSED_CACHE_SUFFIX}"
+        self.data_path = db_path.with_name(f"{base_name}.npy")
+        self.meta_path = db_path.with_name(f"{base_name}.json")
+
+    def _meta(self, version: Sequence[Any], rows: int, columns: list[str]) -> dict:
+        return {
+            "format": PARSED_CACHE_FORMAT,
+            "version": list(version),
+            "rows": rows,
+            "columns": columns,
+        }
+
+    def load(
+        self, version: Sequence[Any], rows: int, columns: list[str]
+    ) -> pd.DataFrame | None:
+        """Memory-map the cached columns, or None when missing or stale"""
+        try:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            if meta != self._meta(version, rows, columns):
+                return None
+            data = np.load(self.data_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if data.shape != (rows, len(columns)):
+            return None
+        return pd.DataFrame(data, columns=columns, copy=False)
+
+    def store(self, version: Sequence[Any], parts: pd.DataFrame) -> None:
+        """Save the columns; a database directory without write access is skipped"""
+        columns = list(parts.columns)
+        data = np.ascontiguousarray(parts.to_numpy(dtype=np.int64))
+        meta = self._meta(version, len(parts), columns)
+        try:
+            self.meta_path.unlink(missing_ok=True)
+            _atomic_write(self.data_path, lambda f: np.save(f, data))
+            _atomic_write(self.meta_path, lambda f: f.write(json.dumps(meta).encode()))
+        except OSError:
+            pass
+
+
+class LruDirectoryCache:
+    """
+    Files in a directory, of which the least recently used are evicted once
+    their total size outgrows `max_bytes`; reads and writes never fail, a
+    broken or unwritable cache just misses
+    """
+
+    SUFFIX = ".bin"
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size: int | None = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def _read(self, key: str, read: Callable[[Path], T]) -> T | None:
+        path = self._path(key)
+        try:
+            value = read(path)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def _write(self, key: str, write: Any, nbytes: int) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            _atomic_write(self._path(key), write)
+        except OSError:
+            return
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += nbytes
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> list[tuple[int, int, Path]]:
+        entries = []
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits its budget"""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+
+
+class StickerCache(LruDirectoryCache):
+    """
+    Rendered stickers stored as uncompressed arrays, which load several times
+    faster than they rasterize; entries are keyed by the sticker text and the
+    fingerprint of the design
+    """
+
+    SUFFIX = ".npy"
+
+    def __init__(self, directory: Path, fingerprint: str, max_bytes: int) -> None:
+        super().__init__(directory, max_bytes)
+        self.fingerprint = fingerprint
+
+    def _key(self, text: str | None) -> str:
+        return hashlib.sha256(f"{self.fingerprint}\0{text!r}".encode()).hexdigest()
+
+    def load(self, text: str | None) -> Image.Image | None:
+        data = self._read(self._key(text), np.load)
+        return None if data is None else Image.fromarray(data)
+
+    def store(self, text: str | None, sticker: Image.Image) -> None:
+        data = np.asarray(sticker)
+        self._write(self._key(text), lambda f: np.save(f, data), data.nbytes)
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """An image as embedded in a PDF: its stream data and the matching attributes"""
+
+    width: int
+    height: int
+    color_space: str
+    filters: tuple[str, ...]
+    content: bytes
+
+
+class PageCache(LruDirectoryCache):
+    """Encoded page images, keyed by a fingerprint of everything on the page"""
+
+    SUFFIX = ".page"
+
+    @staticmethod
+    def _decode(path: Path) -> EncodedImage:
+        header, content = path.read_bytes().split(b"\n", 1)
+        meta = json.loads(header)
+        if meta.pop("format") != PAGE_CACHE_FORMAT:
+            raise ValueError("Outdated page cache entry")
+        filters = tuple(meta.pop("filters"))
+        return EncodedImage(**meta, filters=filters, content=content)
+
+    def load(self, key: str) -> EncodedImage | None:
+        return self._read(key, self._decode)
+
+    def store(self, key: str, image: EncodedImage) -> None:
+        meta = {
+            "format": PAGE_CACHE_FORMAT,
+            "width": image.width,
+            "height": image.height,
+            "color_space": image.color_space,
+            "filters": list(image.filters),
+        }
+        header = json.dumps(meta).encode()
+        self._write(
+            key,
+            lambda f: f.write(header + b"\n" + image.content),
+            len(header) + len(image.content),
+        )
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from src.utils import AppError
+
+
+class ConfigError(AppError, ValueError): ...
+
+
+# "raster" burns the text into each sticker image, "vector" draws it as PDF text,
+# "page" composites all the rasterized stickers of a page into a single image
+RENDER_MODES = ("raster", "vector", "page")
+
+
+@dataclass(frozen=True)
+class DesignSettings:
+    """The `design` section, with the fields of `tiling.DesignConfig`"""
+
+    template_path: str
+    font_path: str
+    font_size: int
+    text_color: str
+    text_y_align: float
+    grid_columns: int
+    grid_rows: int
+    render_mode: str = RENDER_MODES[0]
+    workers: int = 1
+    output_dpi: int | None = None
+    volume_pages: int | None = None
+    sticker_cache_dir: str | None = None
+    sticker_cache_mb: int = 256
+    page_cache_dir: str | None = None
+    page_cache_mb: int = 512
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    db_path: Path
+    design: DesignSettings | None
+    excel_output: Path
+    pdf_output: Path
+
+    @classmethod
+    def load(cls, config_path: Path) -> AppConfig:
+        """
+        Parse and validate the file once; later calls are served from a cache
+        until the file's mtime or size changes
+        """
+        path = Path(config_path).resolve()
+        try:
+            stat = path.stat()
+            version = (stat.st_mtime_ns, stat.st_size)
+            cached = _loaded_configs.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"Cannot read the configuration file {path}: {e}")
+
+        config = cls.from_dict(data)
+        _loaded_configs[path] = (version, config)
+        return config
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> AppConfig:
+        db_path = _section(data, "db").get("path")
+        if not db_path:
+            raise ConfigError("Database path not found in the provided JSON file.")
+        outputs = _section(data, "output-default")
+        design = _section(data, "design")
+        return AppConfig(
+            db_path=Path(db_path).expanduser(),
+            design=_design_settings(design) if design else None,
+            excel_output=Path(outputs.get("excel", "~/output.xlsx")).expanduser(),
+            pdf_output=Path(outputs.get("pdf", "~/output.pdf")).expanduser(),
+        )
+
+    def require_design(self) -> DesignSettings:
+        if self.design is None:
+            raise ConfigError("Design section must be specified in the configuration.")
+        return self.design
+
+
+_loaded_configs: dict[Path, tuple[tuple[int, int], AppConfig]] = {}
+
+
+def _section(data: dict[str, Any], name: str) -> dict[str, Any]:
+    section = data.get(name, {})
+    if not isinstance(section, dict):
+        raise ConfigError(f"Section '{name}' of the configuration must be an object.")
+    return section
+
+
+def _typed(value: Any, kind: type, name: str) -> Any:
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ConfigError(f"'{name}' must be of type {kind.__name__}, got {value!r}.")
+    return value
+
+
+def _design_settings(data: dict[str, Any]) -> DesignSettings:
+    font = _section(data, "font")
+    grid = _section(data, "grid")
+
+    if not data.get("template"):
+        raise ConfigError("Template path must be specified in the configuration.")
+    if not font.get("path"):
+        raise ConfigError("Font path must be specified in the configuration.")
+    render_mode = data.get("render-mode", RENDER_MODES[0])
+    if render_mode not in RENDER_MODES:
+        raise ConfigError(
+            f"'design.render-mode' must be one of {RENDER_MODES}, got {render_mode!r}."
+        )
+    workers = _typed(data.get("workers", 1), int, "design.workers")
+    if workers < 1:
+        raise ConfigError("'design.workers' must be at least 1.")
+    output_dpi = data.get("output-dpi")
+    if output_dpi is not None and _typed(output_dpi, int, "design.output-dpi") < 1:
+        raise ConfigError("'design.output-dpi' must be at least 1.")
+    volume_pages = data.get("volume-pages")
+    if (
+        volume_pages is not None
+        and _typed(volume_pages, int, "design.volume-pages") < 1
+    ):
+        raise ConfigError("'design.volume-pages' must be at least 1.")
+    cache = _section(data, "sticker-cache")
+    cache_dir = cache.get("path")
+    if cache_dir is not None:
+        _typed(cache_dir, str, "design.sticker-cache.path")
+    page_cache = _section(data, "page-cache")
+    page_cache_dir = page_cache.get("path")
+    if page_cache_dir is not None:
+        _typed(page_cache_dir, str, "design.page-cache.path")
+        if render_mode != "page":
+            # only composited pages are cached; it would silently do nothing
+            raise ConfigError(
+                "'design.page-cache' requires 'design.render-mode' to be 'page'."
+            )
+
+    return DesignSettings(
+        template_path=_typed(data["template"], str, "design.template"),
+        font_path=_typed(font["path"], str, "design.font.path"),
+        font_size=_typed(font.get("size", 80), int, "design.font.size"),
+        text_color=_typed(font.get("color", "#000000"), str, "design.font.color"),
+        text_y_align=_typed(
+            font.get("text-y-align", 0.5), float, "design.font.text-y-align"
+        ),
+        grid_columns=_typed(grid.get("columns", 3), int, "design.grid.columns"),
+        grid_rows=_typed(grid.get("rows", 7), int, "design.grid.rows"),
+        render_mode=render_mode,
+        workers=workers,
+        output_dpi=output_dpi,
+        volume_pages=volume_pages,
+        sticker_cache_dir=cache_dir,
+        sticker_cache_mb=_typed(
+            cache.get("max-size-mb", 256), int, "design.sticker-cache.max-size-mb"
+        ),
+        page_cache_dir=page_cache_dir,
+        page_cache_mb=_typed(
+            page_cache.get("max-size-mb", 512), int, "design.page-cache.max-size-mb"
+        ),
+    )
@@ -1,38 +1,125 @@
 from __future__ import annotations
 
-import json
 import sqlite3
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator, Mapping, Sequence, cast
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
+from src.config import AppConfig
+
+try:
+    import pyarrow
+
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:
+    TEXT_DTYPE = "string"
+
+FETCH_BATCH_SIZE = 10_000
+STATEMENT_CACHE_SIZE = 256
+# pragmas of read-only sessions: memory-mapped reads and a 64 MiB page cache
+READ_ONLY_PRAGMAS = {
+    "query_only": "ON",
+    "mmap_size": 256 * 2**20,
+    "cache_size": -64 * 2**10,
+}
+
+
+@lru_cache(maxsize=None)
+def _read_sql_file(sql_path: Path) -> str:
+    return sql_path.read_text(encoding="utf-8")
+
+
+def _typed_column(values: npt.NDArray[np.object_], dtype: Any) -> Any:
+    """Build a column of the given dtype straight from an object array"""
+    if dtype is None:
+        return pd.Series(values).infer_objects()
+    if dtype == "category":
+        codes, categories = pd.factorize(values)
+        return pd.Categorical.from_codes(codes, categories=pd.Index(categories))
+    try:
+        return pd.Series(values, dtype=dtype)
+    except (TypeError, ValueError):
+        # e.g. NULLs in an integer column; fall back to what pandas would infer
+        return pd.to_numeric(pd.Series(values))
+
 
 class SQLiteClient:
-    def __init__(self, config_path: Path):
-        self.db_path = self._load_db_path_from_json(config_path)
+    def __init__(self, config_path: Path, read_only: bool = False):
+        """
+        A `read_only` client suits long-lived sessions: it opens the database
+        through a `mode=ro` URI and tunes the connection for repeated reads
+        """
+        self.db_path = AppConfig.load(config_path).db_path
+        self.read_only = read_only
         self.connection: sqlite3.Connection | None = None
 
-    def _load_db_path_from_json(self, config_path: Path) -> Path:
-        with open(config_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        db_path_str = data.get("db", {}).get("path")
-        if not db_path_str:
-            raise ValueError("Database path not found in the provided JSON file.")
-        return Path(db_path_str).expanduser()
+    @property
+    def version(self) -> tuple[str, int, int, int, int]:
+        """Identifies the database contents by the state of its file and WAL file"""
+        db_stat = self.db_path.stat()
+        wal_path = self.db_path.with_name(f"{self.db_path.name}-wal")
+        wal_stat = wal_path.stat() if wal_path.exists() else None
+        return (
+            str(self.db_path.resolve()),
+            db_stat.st_mtime_ns,
+            db_stat.st_size,
+            wal_stat.st_mtime_ns if wal_stat else 0,
+            wal_stat.st_size if wal_stat else 0,
+        )
 
     def connect(self) -> None:
         if not self.db_path:
             raise ValueError("Database path must be provided to connect.")
-        self.connection = sqlite3.connect(self.db_path)
+        if not self.read_only:
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.row_factory = sqlite3.Row
+            return
+
+        self.connection = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
         self.connection.row_factory = sqlite3.Row
+        for pragma, value in READ_ONLY_PRAGMAS.items():
+            self.connection.execute(f"PRAGMA {pragma} = {value}")
+
+    def ensure_connected(self) -> None:
+        if not self.connection:
+            self.connect()
 
     def close(self) -> None:
         if self.connection:
             self.connection.close()
             self.connection = None
 
-    def dataframe_from_sql_file(self, sql_file_path: str) -> pd.DataFrame:
+    def has_index(self, name: str) -> bool:
+        if not self.connection:
+            raise RuntimeError("Database connection is not established.")
+        row = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+        ).fetchone()
+        return row is not None
+
+    def data_version(self) -> int:
+        """
+        Changes whenever another connection commits to the database; the value
+        itself is only meaningful compared with earlier values on this connection
+        """
+        if not self.connection:
+            raise RuntimeError("Database connection is not established.")
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def _build_query(
+        self,
+        sql_file_path: str,
+        where: str | None = None,
+        columns: Sequence[str] | None = None,
+    ) -> str:
         if not self.connection:
             raise RuntimeError("Database connection is not established.")
 
@@ -40,9 +127,75 @@ class SQLiteClient:
         if not sql_path.exists():
             raise FileNotFoundError(f"SQL file not found: {sql_file_path}")
 
-        query = sql_path.read_text(encoding="utf-8")
+        query = _read_sql_file(sql_path)
+        if where or columns:
+            projection = ", ".join(columns) if columns else "*"
+            query = f"SELECT {projection} FROM ({query.strip().rstrip(';')})"
+            if where:
+                query += f" WHERE {where}"
+        return query
+
+    def dataframe_from_sql_file(
+        self,
+        sql_file_path: str,
+        where: str | None = None,
+        params: Sequence[Any] = (),
+    ) -> pd.DataFrame:
+        """Run the query from the file, optionally narrowed by a WHERE clause"""
+        query = self._build_query(sql_file_path, where)
+        return pd.read_sql_query(query, self.connection, params=list(params))
+
+    def iter_dataframes_from_sql_file(
+        self,
+        sql_file_path: str,
+        chunksize: int,
+        dtype: Mapping[str, Any] | None = None,
+        columns: Sequence[str] | None = None,
+        where: str | None = None,
+        params: Sequence[Any] = (),
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream the result in chunks of at most `chunksize` rows, optionally
+        projected onto `columns` and cast to explicit dtypes
+        """
+        query = self._build_query(sql_file_path, where, columns)
+        yield from pd.read_sql_query(
+            query,
+            self.connection,
+            params=list(params),
+            chunksize=chunksize,
+            dtype=dict(dtype) if dtype else None,
+        )
 
-        return pd.read_sql_query(query, self.connection)
+    def typed_dataframe_from_sql_file(
+        self,
+        sql_file_path: str,
+        dtype: Mapping[str, Any],
+        where: str | None = None,
+        params: Sequence[Any] = (),
+        batch_size: int = FETCH_BATCH_SIZE,
+    ) -> pd.DataFrame:
+        """
+        Fast path of `dataframe_from_sql_file`: rows are fetched as plain tuples
+        in batches and every column is built directly with its given dtype,
+        skipping sqlite3.Row objects and the dtype inference of pandas
+        """
+        query = self._build_query(sql_file_path, where)
+        cursor = cast(sqlite3.Connection, self.connection).cursor()
+        cursor.row_factory = None
+        cursor.execute(query, list(params))
+        names = [description[0] for description in cursor.description]
+        batches = [np.empty((0, len(names)), dtype=object)]
+        while batch := cursor.fetchmany(batch_size):
+            batches.append(np.array(batch, dtype=object))
+        cursor.close()
+        rows = np.concatenate(batches)
+        return pd.DataFrame(
+            {
+                name: _typed_column(rows[:, position], dtype.get(name))
+                for position, name in enumerate(names)
+            }
+        )
 
     def __enter__(self) -> SQLiteClient:
         self.connect()
@@ -1,11 +1,17 @@
-import json
 from functools import partial
 from pathlib import Path
 from typing import Callable
 
 import gi
 
-from src.aggregation import INPUT_PARTS_SEPARATOR, INPUT_RANGE_SEPARATOR
+from src.aggregation import (
+    INPUT_PARTS_SEPARATOR,
+    INPUT_RANGE_SEPARATOR,
+    CatalogueSnapshot,
+)
+from src.config import AppConfig, ConfigError
+from src.fetching import SQLiteClient
+from src.tiling import StickerPool
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
@@ -126,14 +132,9 @@ class MainWindow(Adw.ApplicationWindow):
         buttons_row.add_suffix(container)
         box.append(buttons_row)
 
-        self._set_default_paths()
-
-    def _set_default_paths(self) -> None:
-        with open(self.get_application().config_path, "r", encoding="utf-8") as f:
-            full_data = json.load(f)
-        data = full_data.get("output-default", {})
-        self.excel_path = Path(data.get("excel", "~/output.xlsx")).expanduser()
-        self.pdf_path = Path(data.get("pdf", "~/output.pdf")).expanduser()
+    def set_default_paths(self, config: AppConfig) -> None:
+        self.excel_path = config.excel_output
+        self.pdf_path = config.pdf_output
         self.excel_label.set_text(str(self.excel_path))
         self.pdf_label.set_text(str(self.pdf_path))
 
@@ -237,10 +238,51 @@ class App(Adw.Application):
         super().__init__(application_id="com.example.GtkProcessingApp")
         self.processing_method: Callable[[MainWindow], None] = proccesing_method
         self.config_path = config_path
+        self._database: SQLiteClient | None = None
+        self._catalogue: CatalogueSnapshot | None = None
+        # rasterizing workers kept for the session, restarted when the design changes
+        self.sticker_pool = StickerPool()
+
+    @property
+    def database(self) -> SQLiteClient:
+        """Read-only database session kept open for the lifetime of the app"""
+        if self._database is None:
+            database = SQLiteClient(self.config_path, read_only=True)
+            database.connect()
+            self._database = database
+        return self._database
+
+    @property
+    def catalogue(self) -> CatalogueSnapshot:
+        """Catalogue kept in memory between runs, reloaded when the database changes"""
+        if self._catalogue is None:
+            self._catalogue = CatalogueSnapshot(self.database)
+        return self._catalogue
 
     def run_processing(self, window: MainWindow, _: object) -> None:
         self.processing_method(window)
 
+    @property
+    def config(self) -> AppConfig:
+        return AppConfig.load(self.config_path)
+
     def do_activate(self) -> None:
         win: MainWindow = MainWindow(self)
         win.present()
+        # surface configuration errors now rather than in the middle of a job
+        try:
+            config = self.config
+            config.require_design()
+        except ConfigError as e:
+            win.run_button.set_sensitive(False)
+            win.show_error(f"Niepoprawna konfiguracja: {e}")
+            return
+        win.set_default_paths(config)
+
+    def do_shutdown(self) -> None:
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+        self._catalogue = None
+        self.sticker_pool.shutdown()
+        Adw.Application.do_shutdown(self)
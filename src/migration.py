@@ -0,0 +1,78 @@
+"""
+Optional maintenance of the catalogue database: decomposed callnumber columns
+with a composite index, so that callnumber queries are answered by SQLite.
+
+Run from the repository root: `python -m src.migration upgrade|downgrade [config]`
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+from pathlib import Path
+from typing import cast
+
+from src.aggregation import (
+    CALLNUMBER_INDEX_NAME,
+    CALLNUMBER_INDEXED_PARTS,
+    CALLNUMBER_SQL_PARTS,
+)
+from src.fetching import SQLiteClient
+
+DEFAULT_CONFIG_PATH = Path("config.json")
+# lets the rows matched on the composite index be looked up by callnumber
+CALLNUMBER_LOOKUP_INDEX_NAME = "book_callnumber"
+
+
+def _book_columns(connection: sqlite3.Connection) -> set[str]:
+    # table_xinfo, unlike table_info, also lists generated columns
+    return {row[1] for row in connection.execute("PRAGMA table_xinfo(book)")}
+
+
+def upgrade(connection: sqlite3.Connection) -> None:
+    """Add the generated part columns and their indexes; a no-op when present"""
+    columns = _book_columns(connection)
+    with connection:
+        for column, expression in zip(CALLNUMBER_INDEXED_PARTS, CALLNUMBER_SQL_PARTS):
+            if column not in columns:
+                connection.execute(
+                    f"ALTER TABLE book ADD COLUMN {column} "
+                    f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+                )
+        connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {CALLNUMBER_INDEX_NAME} "
+            f"ON book ({', '.join(CALLNUMBER_INDEXED_PARTS)}, callnumber)"
+        )
+        connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {CALLNUMBER_LOOKUP_INDEX_NAME} "
+            "ON book (callnumber)"
+        )
+
+
+def downgrade(connection: sqlite3.Connection) -> None:
+    """Drop everything `upgrade` added; a no-op on a database without it"""
+    columns = _book_columns(connection)
+    with connection:
+        connection.execute(f"DROP INDEX IF EXISTS {CALLNUMBER_INDEX_NAME}")
+        connection.execute(f"DROP INDEX IF EXISTS {CALLNUMBER_LOOKUP_INDEX_NAME}")
+        for column in CALLNUMBER_INDEXED_PARTS:
+            if column in columns:
+                connection.execute(f"ALTER TABLE book DROP COLUMN {column}")
+
+
+COMMANDS = {"upgrade": upgrade, "downgrade": downgrade}
+
+
+def main(argv: list[str]) -> int:
+    if not argv or argv[0] not in COMMANDS or len(argv) > 2:
+        print(f"Użycie: python -m src.migration {'|'.join(COMMANDS)} [config]")
+        return 2
+    config_path = Path(argv[1]) if len(argv) > 1 else DEFAULT_CONFIG_PATH
+    with SQLiteClient(config_path) as db:
+        COMMANDS[argv[0]](cast(sqlite3.Connection, db.connection))
+    print(f"{argv[0]}: {db.db_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
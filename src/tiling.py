@@ -1,18 +1,30 @@
 from __future__ import annotations
 
-import json
+import hashlib
 import math
-from dataclasses import dataclass
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from itertools import islice
 from pathlib import Path
-from typing import Sequence
+from typing import Callable, Iterable, Iterator, NamedTuple, Sequence, cast
 
-from PIL import Image, ImageDraw, ImageFont
+import PIL
+import reportlab
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from reportlab import rl_config
 from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc, pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
-from src.utils import with_temp_dir
+from src.caching import PAGE_CACHE_FORMAT, EncodedImage, PageCache, StickerCache
+from src.config import RENDER_MODES, AppConfig
 
-TEMP_DIR = Path(".temp")
+# called with the number of pages and of stickers rendered so far
+ProgressCallback = Callable[[int, int], None]
 
 
 @dataclass
@@ -29,32 +41,28 @@ class DesignConfig:
     grid_columns: int
     grid_rows: int
 
+    render_mode: str = RENDER_MODES[0]
+    workers: int = 1
+    # print resolution; a finer template is downsampled to it once, and composited
+    # pages are rendered at it; None keeps the template's resolution
+    output_dpi: int | None = None
+    # split documents into volumes of that many pages; None keeps one document
+    volume_pages: int | None = None
+    # directory of the rendered sticker cache; None disables it
+    sticker_cache_dir: str | None = None
+    sticker_cache_mb: int = 256
+    # directory of the composited page cache of the "page" mode; None disables it
+    page_cache_dir: str | None = None
+    page_cache_mb: int = 512
+
     start_row: int = 1
     start_col: int = 1
 
     @staticmethod
     def load_from_json(config_path: Path) -> DesignConfig:
-        with open(config_path, "r", encoding="utf-8") as f:
-            full_data = json.load(f)
-
-        data = full_data.get("design", {})
-        font = data.get("font", {})
-        grid = data.get("grid", {})
-
-        if not data["template"]:
-            raise ValueError("Template path must be specified in the configuration.")
-        if not font.get("path"):
-            raise ValueError("Font path must be specified in the configuration.")
-
-        return DesignConfig(
-            template_path=data["template"],
-            font_path=font["path"],
-            font_size=font.get("size", 80),
-            text_color=font.get("color", "#000000"),
-            text_y_align=font.get("text-y-align", 0.5),
-            grid_columns=grid.get("columns", 3),
-            grid_rows=grid.get("rows", 7),
-        )
+        """A fresh, mutable copy of the design section of the cached `AppConfig`"""
+        settings = AppConfig.load(config_path).require_design()
+        return DesignConfig(**asdict(settings))
 
     def set_initial_cell(self, row: int, col: int) -> None:
         self.start_row = row
@@ -74,17 +82,111 @@ class DesignConfig:
         return self.grid_columns * self.grid_rows
 
 
+class Placement(NamedTuple):
+    """A grid cell and the PDF coordinates of its lower-left corner"""
+
+    row: int
+    col: int
+    x: float
+    y: float
+
+
+@dataclass(frozen=True)
+class PlacementPlan:
+    """
+    Cells a job's stickers are placed in, in order; every page after the first
+    has the same cells, so the two pages describe a job of any length
+    """
+
+    first_page: tuple[Placement, ...]
+    next_pages: tuple[Placement, ...]
+
+    def cells(self, page: int) -> tuple[Placement, ...]:
+        return self.first_page if page == 0 else self.next_pages
+
+    def total_pages(self, total_stickers: int) -> int:
+        if per_page := len(self.next_pages):
+            _blank_cells = per_page - len(self.first_page)
+            return math.ceil((total_stickers + _blank_cells) / per_page)
+        return 0
+
+    def left_last_page(self, total_stickers: int, total_pages: int) -> int:
+        per_page = len(self.next_pages)
+        if total_pages == 1:
+            return len(self.first_page) - total_stickers
+
+        remaining = total_stickers - len(self.first_page)
+        return per_page - (remaining % per_page or per_page)
+
+
 class PdfCreator:
     PAGE_SIZE = A4
     PAGE_WIDTH, PAGE_HEIGHT = PAGE_SIZE
 
-    def __init__(self, config: DesignConfig) -> None:
+    def __init__(self, config: DesignConfig, pool: StickerPool | None = None) -> None:
+        """
+        `pool` keeps the rasterizing workers beyond one document, e.g. for an app
+        session; without it, a pool lives only while a document is rendered
+        """
         self.config = config
+        self.pool = pool
+        self._sticker_forms: dict[str | None, str] = {}
+        self._pending: dict[str | None, Future[Image.Image]] = {}
+        self._pool: ProcessPoolExecutor | None = None
+        self._page_cells: list[tuple[int, int, str | None]] = []
+        self._placement_plans: dict[tuple[object, ...], PlacementPlan] = {}
+        self.sticker_cache: StickerCache | None = None
+        self.page_cache: PageCache | None = None
+        self._design_fingerprint: str | None = None
+        self.font_size = config.font_size
         self._load_assets()
 
     def _load_assets(self) -> None:
-        self.sticker_template = Image.open(self.config.template_path).convert("RGBA")
-        self.font = ImageFont.truetype(self.config.font_path, self.config.font_size)
+        template = Image.open(self.config.template_path).convert("RGBA")
+        # a template finer than `output_dpi` is downsampled once, together with the font
+        scale = self._template_scale(template)
+        size = (round(template.width * scale), round(template.height * scale))
+        if size[0] < template.width:
+            template = template.resize(size, Image.Resampling.LANCZOS)
+            self.font_size = max(1, round(self.config.font_size * scale))
+        self.sticker_template = template
+        self.font = ImageFont.truetype(self.config.font_path, self.font_size)
+        if self.config.render_mode == "vector":
+            self.pdf_font_name = f"Sticker-{Path(self.config.font_path).stem}"
+            pdfmetrics.registerFont(TTFont(self.pdf_font_name, self.config.font_path))
+        if self.config.sticker_cache_dir:
+            self.sticker_cache = StickerCache(
+                Path(self.config.sticker_cache_dir).expanduser(),
+                self.sticker_fingerprint(),
+                self.config.sticker_cache_mb * 2**20,
+            )
+        if self.config.page_cache_dir:
+            self.page_cache = PageCache(
+                Path(self.config.page_cache_dir).expanduser(),
+                self.config.page_cache_mb * 2**20,
+            )
+
+    @property
+    def design_fingerprint(self) -> str:
+        """`sticker_fingerprint`, computed once per creator"""
+        if self._design_fingerprint is None:
+            self._design_fingerprint = self.sticker_fingerprint()
+        return self._design_fingerprint
+
+    def sticker_fingerprint(self) -> str:
+        """Hash of every input that affects how `build_sticker` draws a sticker"""
+        digest = hashlib.sha256()
+        for path in (self.config.template_path, self.config.font_path):
+            digest.update(Path(path).read_bytes())
+        design = (
+            self.sticker_template.size,
+            self.font_size,
+            self.config.text_color,
+            self.config.text_y_align,
+            PIL.__version__,
+        )
+        digest.update(repr(design).encode())
+        return digest.hexdigest()
 
     @property
     def sticker_size(self) -> tuple[float, float]:
@@ -93,10 +195,30 @@ class PdfCreator:
             self.PAGE_HEIGHT / self.config.grid_rows,
         )
 
+    @property
+    def output_dpi(self) -> float:
+        """Resolution of composited pages; by default that of the template itself"""
+        if self.config.output_dpi:
+            return self.config.output_dpi
+        return self._template_dpi(self.sticker_template)
+
+    def _template_dpi(self, template: Image.Image) -> float:
+        """Resolution at which the template prints when stretched over a cell"""
+        return template.width / (self.sticker_size[0] / 72)
+
+    def _template_scale(self, template: Image.Image) -> float:
+        if not self.config.output_dpi:
+            return 1.0
+        return self.config.output_dpi / self._template_dpi(template)
+
     def build_sticker(self, text: str | None = None) -> Image.Image:
+        if self.sticker_cache and (cached := self.sticker_cache.load(text)):
+            return cached
         template_img = self.sticker_template.copy()
         if text:
             self._fill_sticker_template(text, template_img)
+        if self.sticker_cache:
+            self.sticker_cache.store(text, template_img)
         return template_img
 
     def _fill_sticker_template(self, text: str, template_img: Image.Image) -> None:
@@ -110,31 +232,147 @@ class PdfCreator:
             anchor="mt",  # middle-top
         )
 
-    @with_temp_dir(TEMP_DIR)
-    def generate_pdf(self, texts: Sequence[str | None], output: Path) -> dict[str, int]:
-        canvas_ = canvas.Canvas(str(output), pagesize=self.PAGE_SIZE)
-
+    def generate_pdf(
+        self,
+        texts: Iterable[str | None],
+        output: Path,
+        volume_pages: int | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> dict[str, int]:
+        """
+        Render the stickers into a PDF; texts that are not a sequence
+        are consumed lazily, one page at a time.
+
+        With `volume_pages` (by default from the design) the document is split into
+        volumes `<output stem>-001<suffix>`, ... of that many pages, each saved as
+        soon as it is full, so that memory stays bounded by a single volume;
+        the result then also holds the number of volumes. `progress` is called
+        after every page with the number of pages and stickers done so far.
+        """
+        volume_pages = volume_pages or self.config.volume_pages
         layout = self._calculate_layout()
-        total_pages = self._calculate_total_pages(len(texts), layout)
-        _left_last_page = self._calculate_left_last_page(
-            len(texts), total_pages, layout
-        )
+        with self._rendering_session():
+            if volume_pages or progress or not isinstance(texts, Sequence):
+                return self._generate_pages_lazily(
+                    texts, output, layout, volume_pages, progress
+                )
+
+            canvas_ = canvas.Canvas(str(output), pagesize=self.PAGE_SIZE)
+            total_pages = self._calculate_total_pages(len(texts), layout)
+            _left_last_page = self._calculate_left_last_page(
+                len(texts), total_pages, layout
+            )
+
+            idx = 0
+
+            for page in range(total_pages):
+                # the next page is rasterized in the pool while this one is drawn
+                self._prefetch(texts[idx : idx + 2 * int(layout["per_page"])])
+                idx = self._render_page(
+                    canvas_=canvas_,
+                    texts=texts,
+                    start_idx=idx,
+                    layout=layout,
+                    page_number=page,
+                )
+                self._finish_page(canvas_)
+                canvas_.showPage()
+
+            canvas_.save()
 
-        idx = 0
+        return {"total_pages": total_pages, "left_last_page": _left_last_page}
 
-        for page in range(total_pages):
-            idx = self._render_page(
+    def _generate_pages_lazily(
+        self,
+        texts: Iterable[str | None],
+        output: Path,
+        layout: dict[str, int | float],
+        volume_pages: int | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> dict[str, int]:
+        texts_iter = iter(texts)
+        total_stickers = 0
+        page = 0
+        volumes = 0
+        canvas_: canvas.Canvas | None = None
+
+        page_texts = list(islice(texts_iter, self._page_capacity(page, layout)))
+        while page_texts:
+            if canvas_ is None:
+                volumes += 1
+                canvas_ = self._open_volume(output, volumes if volume_pages else None)
+            next_texts = list(islice(texts_iter, self._page_capacity(page + 1, layout)))
+            self._prefetch(page_texts + next_texts)
+            self._render_page(
                 canvas_=canvas_,
-                texts=texts,
-                start_idx=idx,
+                texts=page_texts,
+                start_idx=0,
                 layout=layout,
                 page_number=page,
             )
+            self._finish_page(canvas_)
             canvas_.showPage()
-
-        canvas_.save()
-
-        return {"total_pages": total_pages, "left_last_page": _left_last_page}
+            total_stickers += len(page_texts)
+            page += 1
+            if progress:
+                progress(page, total_stickers)
+            if volume_pages and page % volume_pages == 0:
+                canvas_.save()
+                canvas_ = None
+            page_texts = next_texts
+
+        if canvas_ is None and not volumes:
+            # an empty job still produces an (empty) document
+            volumes += 1
+            canvas_ = self._open_volume(output, volumes if volume_pages else None)
+        if canvas_ is not None:
+            canvas_.save()
+
+        total_pages = self._calculate_total_pages(total_stickers, layout)
+        _left_last_page = self._calculate_left_last_page(
+            total_stickers, total_pages, layout
+        )
+        info = {"total_pages": total_pages, "left_last_page": _left_last_page}
+        if volume_pages:
+            info["volumes"] = volumes
+        return info
+
+    def _open_volume(self, output: Path, volume: int | None) -> canvas.Canvas:
+        """Start a document; forms are per document, so they start over too"""
+        self._sticker_forms = {}
+        path = output if volume is None else volume_path(output, volume)
+        return canvas.Canvas(str(path), pagesize=self.PAGE_SIZE)
+
+    @contextmanager
+    def _rendering_session(self) -> Iterator[None]:
+        """
+        Per-document state: the embedded sticker forms and, with more than one
+        worker configured for a raster mode, the process pool rasterizing stickers
+        """
+        self._sticker_forms = {}
+        self._pending = {}
+        pool = self.pool or StickerPool()
+        self._pool = pool.executor(self)
+        try:
+            yield
+        finally:
+            self._pool = None
+            for future in self._pending.values():
+                future.cancel()
+            self._pending = {}
+            if pool is not self.pool:
+                pool.shutdown()
+
+    def _prefetch(self, texts: Iterable[str | None]) -> None:
+        """Submit the stickers not embedded or submitted yet to the pool"""
+        if self._pool is None:
+            return
+        for text in dict.fromkeys(texts):
+            if text not in self._sticker_forms and text not in self._pending:
+                self._pending[text] = self._pool.submit(_rasterize_sticker, text)
+
+    def _page_capacity(self, page: int, layout: dict[str, int | float]) -> int:
+        return len(self._placement_plan(layout).cells(page))
 
     def _calculate_layout(self) -> dict[str, int | float]:
         sticker_width = self.PAGE_WIDTH / self.config.grid_columns
@@ -148,28 +386,42 @@ class PdfCreator:
             "per_page": self.config.grid_rows * self.config.grid_columns,
         }
 
+    def _placement_plan(self, layout: dict[str, int | float]) -> PlacementPlan:
+        """The plan for the layout and the starting cell, computed once"""
+        key = (*layout.values(), self.config.start_row, self.config.start_col)
+        if (plan := self._placement_plans.get(key)) is not None:
+            return plan
+
+        cells = [
+            Placement(
+                row=row,
+                col=col,
+                x=col * layout["sticker_w"],
+                y=self.PAGE_HEIGHT - (row + 1) * layout["sticker_h"],
+            )
+            for row in range(int(layout["rows"]))
+            for col in range(int(layout["cols"]))
+        ]
+        plan = PlacementPlan(
+            first_page=tuple(
+                cell
+                for cell in cells
+                if not self._should_skip_cell(0, cell.row, cell.col)
+            ),
+            next_pages=tuple(cells),
+        )
+        self._placement_plans[key] = plan
+        return plan
+
     def _calculate_total_pages(
         self, total_stickers: int, layout: dict[str, int | float]
     ) -> int:
-        _blank_cells = self.config.initall_cell_oridinal - 1
-        total_cells = total_stickers + _blank_cells
-        if per_page := layout.get("per_page"):
-            return math.ceil(total_cells / per_page)
-        return 0
+        return self._placement_plan(layout).total_pages(total_stickers)
 
     def _calculate_left_last_page(
         self, total_stickers: int, total_pages: int, layout: dict[str, int | float]
     ) -> int:
-        _blank_cells = self.config.initall_cell_oridinal - 1
-        first_page_capacity = layout["per_page"] - _blank_cells
-
-        if total_pages == 1:
-            return int(first_page_capacity - total_stickers)
-
-        remaining = total_stickers - first_page_capacity
-        stickers_last_page = remaining % layout["per_page"] or layout["per_page"]
-
-        return int(layout["per_page"] - stickers_last_page)
+        return self._placement_plan(layout).left_last_page(total_stickers, total_pages)
 
     def _render_page(
         self,
@@ -179,28 +431,13 @@ class PdfCreator:
         layout: dict[str, int | float],
         page_number: int,
     ) -> int:
-        idx = start_idx
-
-        for row in range(int(layout["rows"])):
-            for col in range(int(layout["cols"])):
-
-                if self._should_skip_cell(page_number, row, col):
-                    continue
+        cells = self._placement_plan(layout).cells(page_number)
+        page_texts = texts[start_idx : start_idx + len(cells)]
 
-                if idx >= len(texts):
-                    return idx
-
-                self._draw_sticker(
-                    canvas_=canvas_,
-                    text=texts[idx],
-                    idx=idx,
-                    row=row,
-                    col=col,
-                    layout=layout,
-                )
-                idx += 1
+        for cell, text in zip(cells, page_texts):
+            self._draw_sticker(canvas_=canvas_, text=text, cell=cell, layout=layout)
 
-        return idx
+        return start_idx + len(page_texts)
 
     def _should_skip_cell(self, page: int, row: int, col: int) -> bool:
         if page != 0:
@@ -215,27 +452,264 @@ class PdfCreator:
         self,
         canvas_: canvas.Canvas,
         text: str | None,
-        idx: int,
-        row: int,
-        col: int,
+        cell: Placement,
         layout: dict[str, int | float],
     ) -> None:
-        sticker = self.build_sticker(text)
-
-        x = col * layout["sticker_w"]
-        y = self.PAGE_HEIGHT - (row + 1) * layout["sticker_h"]
-
-        temp_path = Path(TEMP_DIR / f"_tmp_{idx}.png")
-        sticker.save(temp_path)
+        if self.config.render_mode == "page":
+            self._paste_sticker(text, cell.row, cell.col, layout)
+            return
+
+        vector = self.config.render_mode == "vector"
+        # in vector mode every cell shares the form of the bare template
+        form = self._sticker_form(canvas_, None if vector else text, layout)
+
+        canvas_.saveState()
+        canvas_.translate(cell.x, cell.y)
+        canvas_.doForm(form)
+        if vector and text:
+            self._draw_text(canvas_, text, layout)
+        canvas_.restoreState()
+
+    def _draw_text(
+        self, canvas_: canvas.Canvas, text: str, layout: dict[str, int | float]
+    ) -> None:
+        """
+        Vector counterpart of `_fill_sticker_template`, drawn in the pixel space of
+        the template scaled onto the cell, so that the text lands where it would
+        in the raster; the top of the glyphs is at `text_y_align` of the height,
+        as with the "mt" anchor of PIL
+        """
+        img_width, img_height = self.sticker_template.size
+        canvas_.scale(layout["sticker_w"] / img_width, layout["sticker_h"] / img_height)
+        # offset of the glyph top from the baseline, negative upwards
+        top = self.font.getbbox(text, anchor="ls")[1]
+        canvas_.setFillColorRGB(
+            *(
+                channel / 255
+                for channel in ImageColor.getrgb(self.config.text_color)[:3]
+            )
+        )
+        canvas_.setFont(self.pdf_font_name, self.font_size)
+        canvas_.drawCentredString(
+            img_width // 2,
+            img_height - int(img_height * self.config.text_y_align) + top,
+            text,
+        )
 
+    def _sticker_form(
+        self,
+        canvas_: canvas.Canvas,
+        text: str | None,
+        layout: dict[str, int | float],
+    ) -> str:
+        """
+        Name of the form XObject holding the sticker with the text; each distinct
+        text is rasterized and embedded once, then referenced at every position
+        """
+        if (name := self._sticker_forms.get(text)) is not None:
+            return name
+
+        name = f"sticker{len(self._sticker_forms)}"
+        canvas_.beginForm(name, 0, 0, layout["sticker_w"], layout["sticker_h"])
+        # handed over in memory; the alpha channel becomes the image's soft mask
         canvas_.drawImage(
-            str(temp_path),
-            x,
-            y,
+            ImageReader(self._sticker_image(text)),
+            0,
+            0,
             width=layout["sticker_w"],
             height=layout["sticker_h"],
             mask="auto",
         )
+        canvas_.endForm()
+        self._sticker_forms[text] = name
+        return name
+
+    def _sticker_image(self, text: str | None) -> Image.Image:
+        """The sticker rasterized by the pool when prefetched, or here otherwise"""
+        future = self._pending.pop(text, None)
+        return future.result() if future else self.build_sticker(text)
+
+    def _paste_sticker(
+        self, text: str | None, row: int, col: int, layout: dict[str, int | float]
+    ) -> None:
+        """Place the sticker on the current page, composited in `_finish_page`"""
+        self._page_cells.append((row, col, text))
+
+    def _compose_page(self) -> Image.Image:
+        """
+        Composite the stickers placed on the current page into one bitmap; cell
+        edges are rounded to whole pixels of `output_dpi`, so cells never overlap
+        """
+        scale = self.output_dpi / 72
+        page = Image.new(
+            "RGB",
+            (round(self.PAGE_WIDTH * scale), round(self.PAGE_HEIGHT * scale)),
+            "white",
+        )
+        stickers: dict[tuple[str | None, tuple[int, int]], Image.Image] = {}
+        sticker_w, sticker_h = (length * scale for length in self.sticker_size)
+        for row, col, text in self._page_cells:
+            left, top = round(col * sticker_w), round(row * sticker_h)
+            size = (
+                round((col + 1) * sticker_w) - left,
+                round((row + 1) * sticker_h) - top,
+            )
+            if (sticker := stickers.get((text, size))) is None:
+                sticker = self._sticker_image(text)
+                if sticker.size != size:
+                    sticker = sticker.resize(size, Image.Resampling.LANCZOS)
+                stickers[(text, size)] = sticker
+            page.paste(sticker, (left, top), sticker)
+        return page
+
+    def _page_fingerprint(self) -> str:
+        """Hash of everything that ends up on the current page"""
+        digest = hashlib.sha256(self.design_fingerprint.encode())
+        page = (
+            PAGE_CACHE_FORMAT,
+            reportlab.Version,
+            rl_config.useA85,
+            self.output_dpi,
+            self.PAGE_SIZE,
+            self.sticker_size,
+            self._page_cells,
+        )
+        digest.update(repr(page).encode())
+        return digest.hexdigest()
+
+    def _finish_page(self, canvas_: canvas.Canvas) -> None:
+        """
+        Embed the composited page, if any, with a single opaque image; with a page
+        cache, a page that was rendered before is embedded from the cache as is
+        """
+        if not self._page_cells:
+            return
+        page: Image.Image | None = None
+        if self.page_cache is not None:
+            name = self._page_fingerprint()
+            if (image := self.page_cache.load(name)) is None:
+                page = self._compose_page()
+                image = _encode_image(page)
+                self.page_cache.store(name, image)
+            try:
+                _draw_encoded_image(
+                    canvas_, name, image, 0, 0, self.PAGE_WIDTH, self.PAGE_HEIGHT
+                )
+                self._page_cells = []
+                return
+            except AttributeError:
+                # the reportlab internals behind the cache changed; embed publicly
+                pass
+        canvas_.drawImage(
+            ImageReader(page if page is not None else self._compose_page()),
+            0,
+            0,
+            width=self.PAGE_WIDTH,
+            height=self.PAGE_HEIGHT,
+        )
+        self._page_cells = []
+
+
+def _encode_image(image: Image.Image) -> EncodedImage:
+    """Encode the image the way `Canvas.drawImage` would embed it"""
+    xobject = pdfdoc.PDFImageXObject(None, ImageReader(image))
+    content = xobject.streamContent
+    return EncodedImage(
+        width=xobject.width,
+        height=xobject.height,
+        color_space=xobject.colorSpace,
+        filters=tuple(xobject._filters),  # type: ignore[attr-defined]
+        content=content.encode("latin-1") if isinstance(content, str) else content,
+    )
+
+
+def _draw_encoded_image(
+    canvas_: canvas.Canvas,
+    name: str,
+    image: EncodedImage,
+    x: float,
+    y: float,
+    width: float,
+    height: float,
+) -> None:
+    """
+    `Canvas.drawImage` for already encoded data, which the public API cannot take;
+    the image is registered with the document the same way, through reportlab
+    internals, so an AttributeError means they changed
+    """
+    doc = canvas_._doc  # type: ignore[attr-defined]
+    registered_name = doc.getXObjectName(name)
+    if registered_name not in doc.idToObject:
+        xobject = pdfdoc.PDFImageXObject(name)
+        xobject.width, xobject.height = image.width, image.height
+        xobject.bitsPerComponent = 8
+        xobject.colorSpace = image.color_space
+        xobject._filters = image.filters  # type: ignore[attr-defined]
+        xobject.streamContent = image.content.decode("latin-1")
+        doc.Reference(xobject, registered_name)
+        doc.addForm(name, xobject)
+    canvas_._currentPageHasImages = 1  # type: ignore[attr-defined]
+    canvas_.saveState()
+    canvas_.translate(x, y)
+    canvas_.scale(width, height)
+    canvas_.doForm(name)
+    canvas_.restoreState()
+
+
+class StickerPool:
+    """
+    Worker processes rasterizing the stickers of a raster mode; they are reused
+    across documents and restarted only when the design changes
+    """
+
+    def __init__(self) -> None:
+        self._executor: ProcessPoolExecutor | None = None
+        self._design: tuple[DesignConfig, str] | None = None
+
+    def executor(self, creator: PdfCreator) -> ProcessPoolExecutor | None:
+        """The pool for the creator's design, None when it rasterizes serially"""
+        config = creator.config
+        if config.workers <= 1 or config.render_mode == "vector":
+            return None
+        # the starting cell only affects placement, not the stickers themselves
+        design = (
+            replace(config, start_row=1, start_col=1),
+            creator.design_fingerprint,
+        )
+        if self._executor is None or design != self._design:
+            self.shutdown()
+            # forked children of a threaded process (e.g. the GTK app) may deadlock
+            self._executor = ProcessPoolExecutor(
+                max_workers=config.workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_worker,
+                initargs=(design[0],),
+            )
+            self._design = design
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self._design = None
+
+
+# the creator of a pool worker, built once from the design by the initializer
+_worker_creator: PdfCreator | None = None
+
+
+def _init_worker(config: DesignConfig) -> None:
+    global _worker_creator
+    _worker_creator = PdfCreator(config)
+
+
+def _rasterize_sticker(text: str | None) -> Image.Image:
+    return cast(PdfCreator, _worker_creator).build_sticker(text)
+
+
+def volume_path(output: Path, volume: int) -> Path:
+    return output.with_name(f"{output.stem}-{volume:03d}{output.suffix}")
 
 
 def validate_template_ratio(
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from parameterized import parameterized
+
+from src.config import AppConfig, ConfigError
+from src.tiling import DesignConfig
+
+CONFIG = {
+    "db": {"path": "~/library.sqlite"},
+    "design": {
+        "template": "template.png",
+        "font": {"path": "font.ttf", "size": 90, "text-y-align": 1},
+        "grid": {"columns": 3, "rows": 7},
+    },
+    "output-default": {"pdf": "~/stickers.pdf"},
+}
+
+
+class TestAppConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_path = Path(self.tmp_dir.name) / "config.json"
+        self.write(CONFIG)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, data, mtime_ns=None):
+        self.config_path.write_text(json.dumps(data))
+        if mtime_ns is not None:
+            os.utime(self.config_path, ns=(mtime_ns, mtime_ns))
+
+    def test_load(self):
+        config = AppConfig.load(self.config_path)
+        self.assertEqual(config.db_path, Path("~/library.sqlite").expanduser())
+        self.assertEqual(config.pdf_output, Path("~/stickers.pdf").expanduser())
+        self.assertEqual(config.excel_output, Path("~/output.xlsx").expanduser())
+        self.assertEqual(config.require_design().text_y_align, 1.0)
+        self.assertEqual(config.require_design().text_color, "#000000")
+        self.assertEqual(config.require_design().render_mode, "raster")
+
+    def test_cached_until_modified(self):
+        self.write(CONFIG, mtime_ns=1_000_000_000)
+        config = AppConfig.load(self.config_path)
+        self.assertIs(AppConfig.load(self.config_path), config)
+
+        self.write({**CONFIG, "db": {"path": "other.sqlite"}}, mtime_ns=2_000_000_000)
+        reloaded = AppConfig.load(self.config_path)
+        self.assertEqual(reloaded.db_path, Path("other.sqlite"))
+
+    def test_design_config_is_a_copy(self):
+        design = DesignConfig.load_from_json(self.config_path)
+        design.set_initial_cell_ordinal(5)
+        self.assertEqual(DesignConfig.load_from_json(self.config_path).start_row, 1)
+
+    def test_missing_design(self):
+        self.write({"db": CONFIG["db"]})
+        config = AppConfig.load(self.config_path)
+        self.assertIsNone(config.design)
+        with self.assertRaises(ConfigError):
+            config.require_design()
+
+    @parameterized.expand(
+        [
+            ({"design": CONFIG["design"]},),
+            ({**CONFIG, "design": {**CONFIG["design"], "template": ""}},),
+            ({**CONFIG, "design": {**CONFIG["design"], "grid": {"rows": "7"}}},),
+            ({**CONFIG, "output-default": []},),
+            ({**CONFIG, "design": {**CONFIG["design"], "render-mode": "svg"}},),
+            ({**CONFIG, "design": {**CONFIG["design"], "workers": 0}},),
+            ({**CONFIG, "design": {**CONFIG["design"], "output-dpi": 0}},),
+            ({**CONFIG, "design": {**CONFIG["design"], "volume-pages": 0}},),
+            ({**CONFIG, "design": {**CONFIG["design"], "page-cache": {"path": 1}}},),
+            ({**CONFIG, "design": {**CONFIG["design"], "page-cache": {"path": "c"}}},),
+        ]
+    )
+    def test_invalid_config(self, data):
+        self.write(data)
+        with self.assertRaises(ConfigError):
+            AppConfig.load(self.config_path)
+
+    def test_page_cache_in_page_mode(self):
+        design = {
+            **CONFIG["design"],
+            "render-mode": "page",
+            "page-cache": {"path": "c"},
+        }
+        self.write({**CONFIG, "design": design})
+        self.assertEqual(
+            AppConfig.load(self.config_path).require_design().page_cache_dir, "c"
+        )
+
+    def test_unreadable_config(self):
+        self.config_path.write_text("{")
+        with self.assertRaises(ConfigError):
+            AppConfig.load(self.config_path)
+        with self.assertRaises(ConfigError):
+            AppConfig.load(self.config_path.with_name("missing.json"))
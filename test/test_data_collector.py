@@ -1,8 +1,26 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
 import unittest
+from pathlib import Path
+from unittest.mock import PropertyMock, patch
 
 import pandas as pd
+from parameterized import parameterized
 
-from src.aggregation import DataCollectorService, DBValidationError
+from src import migration
+from src.aggregation import (
+    CALLNUMBER_INDEX_NAME,
+    DB_VERSION_ATTR,
+    CallnumberFilteringService,
+    CallnumberTuple,
+    CatalogueSnapshot,
+    DataCollectorService,
+    DBValidationError,
+)
+from src.fetching import SQLiteClient
 
 
 class BaseDataCollectorTest(unittest.TestCase):
@@ -41,14 +59,427 @@ class TestValidateCallnumberFormat(BaseDataCollectorTest):
             self.collector.validate_callnumber_format(df_invalid)
 
 
+class TestValidateData(BaseDataCollectorTest):
+    def setUp(self):
+        super().setUp()
+        DataCollectorService._validated_versions.clear()
+        self.addCleanup(DataCollectorService._validated_versions.clear)
+
+    def test_valid_data(self):
+        self.collector.validate_data(self.df)
+
+    def test_reports_every_offender_with_count(self):
+        df = pd.concat([self.df, self.df], ignore_index=True)
+        df.loc[0, "callnumber"] = "InvalidCN"
+        df.loc[1, "callnumber"] = "InvalidCN"
+        with self.assertRaises(DBValidationError) as context:
+            self.collector.validate_data(df)
+        message = str(context.exception)
+        self.assertIn("InvalidCN (x2)", message)
+        self.assertIn("B1/1-023 (x2)", message)
+        self.assertIn("unikalne (2)", message)
+
+    def test_missing_callnumber_is_invalid(self):
+        self.df.loc[0, "callnumber"] = None
+        with self.assertRaises(DBValidationError):
+            self.collector.validate_data(self.df)
+
+    def test_verdict_cached_per_version(self):
+        self.df.attrs[DB_VERSION_ATTR] = ("db", 1)
+        self.collector.validate_data(self.df)
+        self.df.loc[0, "callnumber"] = "InvalidCN"
+        self.collector.validate_data(self.df)
+        self.df.attrs[DB_VERSION_ATTR] = ("db", 2)
+        with self.assertRaises(DBValidationError):
+            self.collector.validate_data(self.df)
+
+
 class TestGetCallnumberList(BaseDataCollectorTest):
     def test_list_repeats_by_quantity_and_sorted(self):
         result = self.collector.get_callnumber_list(self.df)
         expected_order = sorted(["K5/5-001"] * 2 + ["K4/11-101"] * 1 + ["B1/1-023"] * 3)
         self.assertEqual(result, expected_order)
 
+    def test_iterator_matches_list(self):
+        self.df.loc[1, "quantity"] = -1
+        self.assertEqual(
+            list(self.collector.iter_callnumbers(self.df)),
+            self.collector.get_callnumber_list(self.df),
+        )
+
+    def test_missing_quantity_rejected(self):
+        df = self.df.astype({"quantity": "float64"})
+        df.loc[1, "quantity"] = float("nan")
+        for method in (
+            self.collector.get_callnumber_list,
+            self.collector.iter_callnumbers,
+        ):
+            with self.assertRaises(DBValidationError) as context:
+                method(df)
+            self.assertIn("K4/11-101", str(context.exception))
+
     def test_zero_quantity_ignored(self):
         df_zero = self.df.copy()
         df_zero.loc[0, "quantity"] = 0
         result = self.collector.get_callnumber_list(df_zero)
         self.assertNotIn("K5/5-001", result)
+
+
+class BaseDatabaseTest(unittest.TestCase):
+    CALLNUMBERS = [
+        "A9/9-999",
+        "A10/1-001",
+        "A10/2-005",
+        "A10/4-001",
+        "A15/1-001",
+        "A20/1-001",
+        "B15/1-001",
+        "B2/12-010",
+    ]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp_dir.name)
+        db_path = tmp_path / "library.sqlite"
+        with sqlite3.connect(db_path) as connection:
+            connection.execute(
+                "CREATE TABLE book (title TEXT, author TEXT, publisher TEXT, "
+                "callnumber TEXT, quantity INTEGER)"
+            )
+            connection.executemany(
+                "INSERT INTO book VALUES ('T', 'A', 'P', ?, 1)",
+                [(cn,) for cn in self.CALLNUMBERS],
+            )
+        connection.close()
+        self.db_path = db_path
+        self.config_path = tmp_path / "config.json"
+        self.config_path.write_text(json.dumps({"db": {"path": str(db_path)}}))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+class TestGetDataPushdown(BaseDatabaseTest):
+
+    @parameterized.expand(
+        [
+            ("A",),
+            ("A10/2",),
+            ("A10/2-005",),
+            ("A10--A20",),
+            ("A10/2--A10/4",),
+            ("A10/1-001--A10/4-001",),
+            ("A9/9-999--A15",),
+            ("A--A",),
+            ("B2/12;A10",),
+        ],
+    )
+    def test_pushdown_matches_in_memory_filter(self, query):
+        full_data = DataCollectorService.get_data(self.config_path)
+        expected = CallnumberFilteringService.filter(full_data, query)
+        result = DataCollectorService.get_data(self.config_path, query)
+        self.assertEqual(
+            sorted(result["callnumber"].tolist()),
+            sorted(expected["callnumber"].tolist()),
+        )
+
+
+class TestCallnumberIndexMigration(BaseDatabaseTest):
+    QUERIES = [
+        ("A",),
+        ("A10/2",),
+        ("A10/2-005",),
+        ("A10--A20",),
+        ("A10/2--A10/4",),
+        ("A10/1-001--A10/4-001",),
+        ("A9/9-999--A15",),
+        ("A--A",),
+        ("B2/12;A10",),
+    ]
+
+    def migrate(self, command):
+        with sqlite3.connect(self.db_path) as connection:
+            command(connection)
+        connection.close()
+
+    def schema(self):
+        with sqlite3.connect(self.db_path) as connection:
+            schema = connection.execute(
+                "SELECT type, name, sql FROM sqlite_master ORDER BY name"
+            ).fetchall()
+        connection.close()
+        return schema
+
+    @parameterized.expand(QUERIES)
+    def test_indexed_pushdown_matches_in_memory_filter(self, query):
+        full_data = DataCollectorService.get_data(self.config_path)
+        expected = CallnumberFilteringService.filter(full_data, query)
+        self.migrate(migration.upgrade)
+        result = DataCollectorService.get_data(self.config_path, query)
+        self.assertIn("callnumber IN", result.attrs[DB_VERSION_ATTR][1])
+        self.assertEqual(
+            sorted(result["callnumber"].tolist()),
+            sorted(expected["callnumber"].tolist()),
+        )
+
+    def test_query_plan_uses_index(self):
+        self.migrate(migration.upgrade)
+        where, params = CallnumberFilteringService.to_indexed_sql("A10/2--A10/4")
+        with sqlite3.connect(self.db_path) as connection:
+            plan = connection.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM book WHERE {where}", params
+            ).fetchall()
+        connection.close()
+        details = [row[3] for row in plan]
+        self.assertTrue(
+            any(CALLNUMBER_INDEX_NAME in detail for detail in details), details
+        )
+        self.assertFalse(any(detail.startswith("SCAN") for detail in details), details)
+
+    def test_upgrade_is_idempotent(self):
+        self.migrate(migration.upgrade)
+        schema = self.schema()
+        self.migrate(migration.upgrade)
+        self.assertEqual(self.schema(), schema)
+
+    def test_downgrade_restores_schema(self):
+        schema = self.schema()
+        self.migrate(migration.upgrade)
+        self.migrate(migration.downgrade)
+        self.assertEqual(self.schema(), schema)
+        self.migrate(migration.downgrade)
+        self.assertEqual(self.schema(), schema)
+
+    def test_without_index_falls_back_to_expressions(self):
+        result = DataCollectorService.get_data(self.config_path, "A10")
+        self.assertNotIn("callnumber IN", result.attrs[DB_VERSION_ATTR][1])
+
+
+class TestParsedCallnumberSidecar(BaseDatabaseTest):
+    COLUMNS = [*CallnumberTuple._fields, "key_"]
+
+    def test_warm_run_skips_parsing(self):
+        expected = DataCollectorService.build_index(
+            DataCollectorService.get_data(self.config_path)
+        )
+        self.assertTrue(
+            self.db_path.with_name("library.sqlite.callnumbers.npy").exists()
+        )
+
+        with patch.object(
+            CallnumberFilteringService, "_parse_df_callnumber"
+        ) as mock_parse:
+            result = DataCollectorService.build_index(
+                DataCollectorService.get_data(self.config_path)
+            )
+        mock_parse.assert_not_called()
+        pd.testing.assert_frame_equal(
+            result.frame[self.COLUMNS], expected.frame[self.COLUMNS]
+        )
+
+    def test_stale_cache_rebuilt(self):
+        DataCollectorService.build_index(
+            DataCollectorService.get_data(self.config_path)
+        )
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute("INSERT INTO book VALUES ('T', 'A', 'P', 'C1/1-001', 1)")
+        connection.close()
+
+        index = DataCollectorService.build_index(
+            DataCollectorService.get_data(self.config_path)
+        )
+        self.assertEqual(len(index), len(self.CALLNUMBERS) + 1)
+        self.assertIn("C1/1-001", index.frame["callnumber"].tolist())
+        self.assertEqual(index.frame["room_"].max(), 2)
+
+    def test_change_during_load_not_cached(self):
+        validated = dict(DataCollectorService._validated_versions)
+        versions = [("db", 1), ("db", 2)]
+        with patch.object(
+            SQLiteClient, "version", new_callable=PropertyMock, side_effect=versions
+        ):
+            data = DataCollectorService.get_data(self.config_path)
+        self.assertNotIn(DB_VERSION_ATTR, data.attrs)
+
+        DataCollectorService.validate_data(data)
+        DataCollectorService.build_index(data)
+        self.assertEqual(dict(DataCollectorService._validated_versions), validated)
+        self.assertFalse(
+            self.db_path.with_name("library.sqlite.callnumbers.npy").exists()
+        )
+
+    def test_pushdown_load_not_cached(self):
+        DataCollectorService.build_index(
+            DataCollectorService.get_data(self.config_path, "A10")
+        )
+        self.assertFalse(
+            self.db_path.with_name("library.sqlite.callnumbers.npy").exists()
+        )
+
+
+class TestChunkedFiltering(BaseDatabaseTest):
+    @parameterized.expand([("A10/2--A10/4;B",), ("A",), ("C",)])
+    def test_chunked_matches_full_filter(self, query):
+        expected = CallnumberFilteringService.filter(
+            DataCollectorService.get_data(self.config_path), query
+        )
+        result = DataCollectorService.get_filtered_data_chunked(
+            self.config_path, query, chunksize=3
+        )
+        self.assertEqual(result["callnumber"].tolist(), expected["callnumber"].tolist())
+        self.assertTrue(result.index.is_unique)
+
+    def test_duplicates_across_chunks_detected(self):
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute("INSERT INTO book VALUES ('T', 'A', 'P', 'A9/9-999', 1)")
+        connection.close()
+        with self.assertRaises(DBValidationError) as context:
+            DataCollectorService.get_filtered_data_chunked(
+                self.config_path, "B", chunksize=3
+            )
+        self.assertIn("A9/9-999 (x2)", str(context.exception))
+
+    def test_differently_padded_callnumbers_are_distinct(self):
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT INTO book VALUES ('T', 'A', 'P', 'A09/9-999', 1)"
+            )
+        connection.close()
+        DataCollectorService.validate_data(
+            DataCollectorService.get_data(self.config_path)
+        )
+        result = DataCollectorService.get_filtered_data_chunked(
+            self.config_path, "A9", chunksize=3
+        )
+        self.assertEqual(result["callnumber"].tolist(), ["A9/9-999", "A09/9-999"])
+
+    def test_duplicates_reported_as_stored(self):
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT INTO book VALUES ('T', 'A', 'P', 'A10/01-001', 1)"
+            )
+            connection.execute(
+                "INSERT INTO book VALUES ('T', 'A', 'P', 'A10/01-001', 1)"
+            )
+        connection.close()
+        with self.assertRaises(DBValidationError) as context:
+            DataCollectorService.get_filtered_data_chunked(
+                self.config_path, "B", chunksize=3
+            )
+        self.assertIn("(1): A10/01-001 (x2)", str(context.exception))
+
+    def test_streaming_fetch_projects_and_casts_columns(self):
+        with SQLiteClient(self.config_path) as db:
+            chunks = list(
+                db.iter_dataframes_from_sql_file(
+                    "src/basequery.sql",
+                    chunksize=3,
+                    dtype={"quantity": "int32"},
+                    columns=["callnumber", "quantity"],
+                )
+            )
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 2])
+        self.assertEqual(list(chunks[0].columns), ["callnumber", "quantity"])
+        self.assertEqual(chunks[0]["quantity"].dtype, "int32")
+
+
+class TestTypedFetch(BaseDatabaseTest):
+    def test_typed_fetch_matches_pandas_path(self):
+        with SQLiteClient(self.config_path) as db:
+            expected = db.dataframe_from_sql_file("src/basequery.sql")
+            result = db.typed_dataframe_from_sql_file(
+                "src/basequery.sql",
+                {"author": "category", "callnumber": "string", "quantity": "int32"},
+                batch_size=3,
+            )
+        self.assertEqual(result["author"].dtype, "category")
+        self.assertEqual(result["quantity"].dtype, "int32")
+        pd.testing.assert_frame_equal(
+            result.astype(object), expected.astype(object), check_dtype=False
+        )
+
+    def test_typed_fetch_with_nulls(self):
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT INTO book VALUES (NULL, NULL, 'P', 'C1/1-001', NULL)"
+            )
+        connection.close()
+        with SQLiteClient(self.config_path) as db:
+            result = db.typed_dataframe_from_sql_file(
+                "src/basequery.sql", {"author": "category", "quantity": "int32"}
+            )
+        self.assertTrue(pd.isna(result["author"].iloc[-1]))
+        self.assertTrue(pd.isna(result["quantity"].iloc[-1]))
+
+
+class TestReadOnlySession(BaseDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        self.db = SQLiteClient(self.config_path, read_only=True)
+        self.addCleanup(self.db.close)
+
+    def test_session_is_reused_across_calls(self):
+        first = DataCollectorService.get_data(self.db, "A")
+        connection = self.db.connection
+        second = DataCollectorService.get_data(self.db, "B")
+        self.assertIs(self.db.connection, connection)
+        self.assertEqual(len(first) + len(second), len(self.CALLNUMBERS))
+
+    def test_session_cannot_write(self):
+        self.db.connect()
+        query_only = self.db.connection.execute("PRAGMA query_only").fetchone()[0]
+        self.assertEqual(query_only, 1)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db.connection.execute("DELETE FROM book")
+
+    def test_missing_database_not_created(self):
+        self.config_path.write_text(
+            json.dumps({"db": {"path": str(self.db_path.with_name("missing.db"))}})
+        )
+        db = SQLiteClient(self.config_path, read_only=True)
+        with self.assertRaises(sqlite3.OperationalError):
+            db.connect()
+        self.assertFalse(self.db_path.with_name("missing.db").exists())
+
+
+class TestCatalogueSnapshot(BaseDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        self.db = SQLiteClient(self.config_path, read_only=True)
+        self.addCleanup(self.db.close)
+        self.snapshot = CatalogueSnapshot(self.db)
+
+    def insert(self, db_path, callnumber):
+        with sqlite3.connect(db_path) as connection:
+            connection.execute(
+                "INSERT INTO book VALUES ('T', 'A', 'P', ?, 1)", (callnumber,)
+            )
+        connection.close()
+
+    def test_unchanged_database_not_reloaded(self):
+        index = self.snapshot.index()
+        self.assertEqual(len(index), len(self.CALLNUMBERS))
+        with patch.object(DataCollectorService, "get_data") as mock_get_data:
+            self.assertIs(self.snapshot.index(), index)
+        mock_get_data.assert_not_called()
+
+    def test_commit_from_another_connection_reloads(self):
+        self.snapshot.index()
+        self.insert(self.db_path, "C1/1-001")
+        index = self.snapshot.index()
+        self.assertEqual(len(index), len(self.CALLNUMBERS) + 1)
+        self.assertIn("C1/1-001", index.frame["callnumber"].tolist())
+
+    def test_replaced_file_reloads(self):
+        self.snapshot.index()
+        replacement = self.db_path.with_name("replacement.sqlite")
+        shutil.copy(self.db_path, replacement)
+        self.insert(replacement, "C1/1-001")
+        os.replace(replacement, self.db_path)
+        self.assertEqual(len(self.snapshot.index()), len(self.CALLNUMBERS) + 1)
+
+    def test_invalid_catalogue_not_kept(self):
+        self.insert(self.db_path, "A10/1-001")
+        for _ in range(2):
+            with self.assertRaises(DBValidationError):
+                self.snapshot.index()
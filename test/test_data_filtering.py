@@ -1,15 +1,20 @@
 import unittest
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
 from parameterized import parameterized
 
 from src.aggregation import (
     CallnumberCondition,
     CallnumberFilteringService,
+    CallnumberIndex,
     CallnumberParseError,
     CallnumberRangeCondition,
     CallnumberTuple,
+    DataCollectorService,
+    DBValidationError,
+    pack_callnumber_key,
 )
 
 
@@ -42,6 +47,8 @@ class TestCallnumberCondition(unittest.TestCase):
             "12/3-012",
             "B12-022",
             "A1/2-0229",
+            "A2000000",
+            "A1/1048576",
         ],
     )
     def test_from_text_invalid_patterns(self, text):
@@ -169,14 +176,14 @@ class TestCallnumberFilteringService(unittest.TestCase):
 
 class TestCallnumberFilteringServiceFilter(unittest.TestCase):
 
-    @patch.object(CallnumberFilteringService, "_decompose_query")
+    @patch.object(CallnumberFilteringService, "compile")
     @patch.object(CallnumberFilteringService, "_parse_df_callnumber")
-    @patch.object(CallnumberFilteringService, "apply_conditions")
+    @patch.object(CallnumberFilteringService, "apply_masks")
     def test_filter_method(
         self,
         mock_apply,
         mock_parse_df,
-        mock_decompose,
+        mock_compile,
     ):
         df = pd.DataFrame(
             {
@@ -185,7 +192,7 @@ class TestCallnumberFilteringServiceFilter(unittest.TestCase):
             }
         )
 
-        mock_decompose.return_value = [MagicMock()]
+        mock_compile.return_value = MagicMock(conditions=(MagicMock(),))
         mock_parse_df.return_value = pd.DataFrame(
             [
                 ("A", 12, 3, 2),
@@ -194,9 +201,220 @@ class TestCallnumberFilteringServiceFilter(unittest.TestCase):
             columns=CallnumberTuple._fields,
         )
 
-        mock_apply.side_effect = [True, False]
+        mock_apply.return_value = np.array([True, False])
 
         result = CallnumberFilteringService.filter(df, "A12")
 
         self.assertEqual(len(result), 1)
         self.assertEqual(result.iloc[0]["id"], 1)
+
+
+class TestVectorizedMasks(unittest.TestCase):
+    CALLNUMBERS = [
+        "A9/9-999",
+        "A10/1-001",
+        "A10/2-005",
+        "A10/4-001",
+        "A15/1-001",
+        "A20/1-001",
+        "B15/1-001",
+        "a10/3-002",
+        "A10-001",
+    ]
+
+    def setUp(self):
+        self.df = pd.DataFrame({"callnumber": self.CALLNUMBERS})
+        self.parts = CallnumberFilteringService._parse_df_callnumber(self.df)
+
+    def test_parse_df_callnumber_integer_columns(self):
+        self.assertEqual(list(self.parts.columns), list(CallnumberTuple._fields))
+        self.assertEqual(self.parts.iloc[7].tolist(), [0, 10, 3, 2])
+        self.assertEqual(self.parts.iloc[8].tolist(), [-1, -1, -1, -1])
+
+    @parameterized.expand(
+        [
+            ("A",),
+            ("A10",),
+            ("A10/2",),
+            ("A10/2-005",),
+            ("A10--A20",),
+            ("A10/2--A10/4",),
+            ("A10/1-001--A10/4-001",),
+            ("A9/9-999--A15",),
+            ("B;A10/2--A10/4",),
+        ],
+    )
+    def test_masks_match_rowwise_assess(self, query):
+        conditions = CallnumberFilteringService._decompose_query(query)
+        expected = [
+            any(
+                condit.assess(CallnumberTuple(*CallnumberCondition.parse_full(cn)))
+                for condit in conditions
+            )
+            for cn in self.CALLNUMBERS
+        ]
+        result = CallnumberFilteringService.apply_masks(conditions, self.parts)
+        self.assertEqual(result.tolist(), expected)
+
+
+class TestCallnumberIndex(unittest.TestCase):
+    CALLNUMBERS = TestVectorizedMasks.CALLNUMBERS
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "callnumber": self.CALLNUMBERS,
+                "quantity": range(len(self.CALLNUMBERS)),
+            }
+        )
+        self.index = CallnumberIndex(self.df)
+
+    def test_keys_follow_callnumber_order(self):
+        self.assertLess(pack_callnumber_key(0, 9, 9, 999), pack_callnumber_key(0, 10))
+        self.assertLess(pack_callnumber_key(0, 10, 4, 1), pack_callnumber_key(1))
+        self.assertTrue((self.index.keys[:-1] <= self.index.keys[1:]).all())
+
+    def test_key_range_of_prefix(self):
+        start, end = CallnumberCondition.from_text("A10/2").key_range()
+        self.assertEqual(start, pack_callnumber_key(0, 10, 2))
+        self.assertEqual(end, pack_callnumber_key(0, 10, 3))
+
+    def test_overflowing_callnumber_rejected(self):
+        df = pd.DataFrame({"callnumber": ["A1/1-001", "A9999999/1-001"]})
+        with self.assertRaises(DBValidationError):
+            CallnumberIndex(df)
+
+    @parameterized.expand(
+        [
+            ("A",),
+            ("A10",),
+            ("A10/2",),
+            ("A10/2-005",),
+            ("A10--A20",),
+            ("A10/2--A10/4",),
+            ("A10/1-001--A10/4-001",),
+            ("A9/9-999--A15",),
+            ("A20--A10",),
+            ("A--A",),
+            ("B;A10/2--A10/4;A10",),
+            ("A1048575",),
+        ],
+    )
+    def test_lookup_matches_mask_filter(self, query):
+        expected = CallnumberFilteringService.filter(self.df, query)
+        result = CallnumberFilteringService.filter_index(self.index, query)
+        self.assertEqual(
+            sorted(result["callnumber"].tolist()),
+            sorted(expected["callnumber"].tolist()),
+        )
+
+    def test_filter_many_matches_single_queries(self):
+        queries = ["A", "A10/2--A10/4;B", "A10/2-005", "A--A", "C"]
+        result = CallnumberFilteringService.filter_index_many(self.index, queries)
+        self.assertEqual(list(result), queries)
+        for query in queries:
+            pd.testing.assert_frame_equal(
+                result[query],
+                CallnumberFilteringService.filter_index(self.index, query),
+            )
+
+    def test_filter_many_on_frame_matches_filter(self):
+        queries = ["A", "A10/2--A10/4;B", "A10/2-005", "A--A", "C"]
+        for df in (self.df, self.df.assign(callnumber=[*self.CALLNUMBERS[:-1], "?"])):
+            result = DataCollectorService.filter_data_many(df, queries)
+            for query in queries:
+                pd.testing.assert_frame_equal(
+                    result[query], DataCollectorService.filter_data(df, query)
+                )
+
+    def test_filter_many_with_overflowing_callnumber(self):
+        df = pd.DataFrame({"callnumber": ["A2000000/1-001", "A1/1-001"]})
+        result = DataCollectorService.filter_data_many(df, ["A1--A", "A1"])
+        for query, frame in result.items():
+            pd.testing.assert_frame_equal(
+                frame, DataCollectorService.filter_data(df, query)
+            )
+
+
+class TestCompiledQuery(unittest.TestCase):
+    def setUp(self):
+        CallnumberFilteringService._compile_normalized.cache_clear()
+
+    def test_normalized_queries_share_compiled_object(self):
+        compiled = CallnumberFilteringService.compile("a10/2--a10/4 ")
+        self.assertIs(compiled, CallnumberFilteringService.compile("A10/2--A10/4"))
+        self.assertEqual(compiled.query, "A10/2--A10/4")
+
+    def test_key_ranges_precomputed(self):
+        compiled = CallnumberFilteringService.compile("A10/2;B")
+        self.assertEqual(
+            compiled.key_ranges.tolist(),
+            [list(condit.key_range()) for condit in compiled.conditions],
+        )
+        self.assertFalse(compiled.key_ranges.flags.writeable)
+
+    def test_invalid_query_not_cached(self):
+        with self.assertRaises(CallnumberParseError):
+            CallnumberFilteringService.compile("A1--A2--A3")
+        self.assertEqual(
+            CallnumberFilteringService._compile_normalized.cache_info().currsize, 0
+        )
+
+    def test_zero_parts_are_significant(self):
+        condition = CallnumberCondition.from_text("A1/2-000")
+        self.assertEqual(condition.maxlevel, 4)
+        self.assertFalse(condition.assess(CallnumberTuple("A", 1, 2, 5)))
+        self.assertTrue(condition.assess(CallnumberTuple("A", 1, 2, 0)))
+
+
+class TestQueryOptimizer(unittest.TestCase):
+    CALLNUMBERS = TestVectorizedMasks.CALLNUMBERS + [
+        "A10/2-000",
+        "A10/2-001",
+        "A10/3-999",
+        "A20/9-999",
+        "B1/1-001",
+        "C1/1-001",
+    ]
+
+    @parameterized.expand(
+        [
+            ("K1;K1/2;K1/2-002--K1/2-009;K1/3--K1/5", "K1"),
+            ("A10/2;A10/3", "A10/2--A10/4"),
+            ("A10/2-005;A10/2-006", "A10/2-005--A10/2-006"),
+            ("B;A10/2-001--A10/2-009;A10/2", "A10/2;B"),
+            ("A10--A20;A15/2", "A10--A20"),
+            ("A10/2-003--A10/3", "A10/2-003--A10/3"),
+            ("A10/2-003--A10/3-000", "A10/2-003--A10/3-000"),
+            ("A10/2-003;A", "A"),
+            ("A10--A;A10--A", "A10--A"),
+            ("A3--A;A4", "A4"),
+            ("A15--A;A20/1--A1048575", "A20/1--A1048575"),
+        ],
+    )
+    def test_simplified_query(self, query, expected):
+        compiled = CallnumberFilteringService.compile(query)
+        self.assertEqual(compiled.simplified, expected)
+
+    @parameterized.expand(
+        [
+            ("K1;K1/2;K1/2-002--K1/2-009;K1/3--K1/5",),
+            ("A10/2;A10/3;A10/2-000",),
+            ("A9/9-999--A10/2-000;A10/2-001--A10/3",),
+            ("B;A10/2-001--A10/2-009;A10/2;C1/1-001",),
+            ("A10--A20;A15/2;A20",),
+            ("A20/1--A1048575;A",),
+        ],
+    )
+    def test_optimized_conditions_select_same_rows(self, query):
+        original = CallnumberFilteringService._decompose_query(query)
+        optimized = CallnumberFilteringService.compile(query).conditions
+        for callnumber in self.CALLNUMBERS:
+            callnumber_tuple = CallnumberTuple(
+                *CallnumberCondition.parse_full(callnumber)
+            )
+            self.assertEqual(
+                any(condit.assess(callnumber_tuple) for condit in original),
+                any(condit.assess(callnumber_tuple) for condit in optimized),
+                callnumber,
+            )
@@ -1,10 +1,34 @@
+import os
+import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import pymupdf
 from parameterized import parameterized
-
-from src.tiling import DesignConfig, PdfCreator
+from PIL import Image, ImageFont
+
+from src.caching import PageCache, StickerCache
+from src.tiling import (
+    DesignConfig,
+    PdfCreator,
+    StickerPool,
+    _encode_image,
+    volume_path,
+)
+
+
+def sample_design() -> DesignConfig:
+    """The design of the bundled sample assets, independent of the user's config"""
+    return DesignConfig(
+        template_path="assets/sample.template.png",
+        font_path="assets/SpecialGothicExpandedOne-Regular.ttf",
+        font_size=90,
+        text_color="#000000",
+        text_y_align=0.65,
+        grid_columns=3,
+        grid_rows=7,
+    )
 
 
 class TestDesignConfig(unittest.TestCase):
@@ -153,6 +177,277 @@ class TestGeneratePdf(BasePdfTest):
 
         self.assertEqual(self.creator._render_page.call_count, 5)
 
+    def test_generate_pdf_consumes_iterator_page_by_page(self):
+        self.config.set_initial_cell(row=1, col=2)
+        self.creator._render_page = MagicMock()
+        texts = (f"T{i}" for i in range(20))
+
+        with patch("src.tiling.canvas.Canvas"):
+            info = self.creator.generate_pdf(texts, Path("fake.pdf"))
+
+        page_texts = [
+            call.kwargs["texts"] for call in self.creator._render_page.call_args_list
+        ]
+        self.assertEqual([len(chunk) for chunk in page_texts], [8, 9, 3])
+        self.assertEqual(page_texts[0][0], "T0")
+        self.assertEqual(page_texts[-1][-1], "T19")
+        self.assertEqual(info, {"total_pages": 3, "left_last_page": 6})
+
+    def test_each_distinct_text_embedded_once(self):
+        texts = ["A1/1-001", "A1/1-001", None, "A1/1-002", "A1/1-001", None]
+        colors = {"A1/1-001": "red", "A1/1-002": "blue", None: "white"}
+        self.creator.build_sticker = MagicMock(
+            side_effect=lambda text: Image.new("RGBA", (30, 70), colors[text])
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = Path(tmp_dir) / "stickers.pdf"
+            self.creator.generate_pdf(texts, output)
+            pdf = output.read_bytes()
+
+        drawn = [call.args[0] for call in self.creator.build_sticker.call_args_list]
+        self.assertEqual(drawn, ["A1/1-001", None, "A1/1-002"])
+        self.assertEqual(pdf.count(b"/Subtype /Form"), 3)
+
+    def test_creator_reused_for_another_document(self):
+        texts = ["A1/1-001", "A1/1-001", "A1/1-002"]
+        self.creator.build_sticker = MagicMock(
+            side_effect=lambda text: Image.new("RGBA", (30, 70), "white")
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ("first.pdf", "second.pdf"):
+                # forms belong to a document, so every document embeds its own
+                self.creator.generate_pdf(texts, Path(tmp_dir) / name)
+                pdf = (Path(tmp_dir) / name).read_bytes()
+                self.assertEqual(pdf.count(b"/Subtype /Form"), 2)
+
+    def test_vector_mode_shares_template_and_draws_text(self):
+        self.config.render_mode = "vector"
+        self.config.text_color = "#102030"
+        self.creator.sticker_template = Image.new("RGBA", (300, 700), "white")
+        self.creator.pdf_font_name = "Helvetica"
+        self.creator.font = ImageFont.load_default(self.config.font_size)
+        self.creator.build_sticker = MagicMock(
+            side_effect=lambda text: self.creator.sticker_template.copy()
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = Path(tmp_dir) / "stickers.pdf"
+            self.creator.generate_pdf(["A1/1-001", "A1/1-002", None], output)
+            pdf = output.read_bytes()
+
+        self.creator.build_sticker.assert_called_once_with(None)
+        self.assertEqual(pdf.count(b"/Subtype /Form"), 1)
+
+
+class TestStreamingVolumes(BasePdfTest):
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.output = Path(self.tmp_dir.name) / "stickers.pdf"
+        self.creator.build_sticker = MagicMock(
+            side_effect=lambda text: Image.new("RGBA", (30, 70), "white")
+        )
+
+    def test_split_into_volumes(self):
+        progress = MagicMock()
+        texts = (f"T{i % 4}" for i in range(40))
+
+        info = self.creator.generate_pdf(
+            texts, self.output, volume_pages=2, progress=progress
+        )
+
+        self.assertEqual(info, {"total_pages": 5, "left_last_page": 5, "volumes": 3})
+        self.assertFalse(self.output.exists())
+        volumes = sorted(Path(self.tmp_dir.name).iterdir())
+        self.assertEqual(
+            [path.name for path in volumes],
+            ["stickers-001.pdf", "stickers-002.pdf", "stickers-003.pdf"],
+        )
+        for path in volumes:
+            # every volume embeds its own forms for the stickers it uses
+            self.assertEqual(path.read_bytes().count(b"/Subtype /Form"), 4)
+        self.assertEqual(
+            [call.args for call in progress.call_args_list],
+            [(1, 9), (2, 18), (3, 27), (4, 36), (5, 40)],
+        )
+
+    def test_volume_pages_from_design(self):
+        self.config.volume_pages = 1
+        info = self.creator.generate_pdf(["T1"] * 10, self.output)
+        self.assertEqual(info["volumes"], 2)
+        self.assertTrue(volume_path(self.output, 2).exists())
+
+    def test_empty_job_writes_empty_volume(self):
+        info = self.creator.generate_pdf([], self.output, volume_pages=2)
+        self.assertEqual(info["volumes"], 1)
+        self.assertTrue(volume_path(self.output, 1).exists())
+
+
+class TestPageCompositing(BasePdfTest):
+    def setUp(self):
+        super().setUp()
+        self.config.render_mode = "page"
+        self.config.output_dpi = 36
+        self.creator.build_sticker = MagicMock(
+            side_effect=lambda text: Image.new("RGBA", (50, 50), "red")
+        )
+
+    def test_output_dpi_defaults_to_template_resolution(self):
+        self.config.output_dpi = None
+        sticker_w, _ = self.creator.sticker_size
+        self.creator.sticker_template = Image.new("RGBA", (300, 700))
+        self.assertAlmostEqual(self.creator.output_dpi, 300 / (sticker_w / 72))
+
+    def test_page_composited_into_single_image(self):
+        self.config.set_initial_cell_ordinal(2)
+        canvas_ = MagicMock()
+
+        self.creator._render_page(
+            canvas_=canvas_,
+            texts=["A1/1-001", "A1/1-002"],
+            start_idx=0,
+            layout=self.creator._calculate_layout(),
+            page_number=0,
+        )
+        page = self.creator._compose_page()
+        self.creator._finish_page(canvas_)
+
+        canvas_.doForm.assert_not_called()
+        canvas_.drawImage.assert_called_once()
+        self.assertEqual(self.creator._page_cells, [])
+        self.assertEqual(page.size, (round(self.creator.PAGE_WIDTH / 2), 421))
+        cell_w, cell_h = page.width / 3, page.height / 3
+        self.assertEqual(page.getpixel((cell_w / 2, cell_h / 2)), (255, 255, 255))
+        self.assertEqual(page.getpixel((cell_w * 1.5, cell_h / 2)), (255, 0, 0))
+        self.assertEqual(page.getpixel((cell_w * 2.5, cell_h / 2)), (255, 0, 0))
+        self.assertEqual(page.getpixel((cell_w / 2, cell_h * 1.5)), (255, 255, 255))
+
+
+class TestPageCache(unittest.TestCase):
+    TEXTS = ["A1/1-001", "A1/1-002", "B2/3-004", None, "A1/1-001"]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.config = sample_design()
+        self.config.render_mode = "page"
+        self.config.output_dpi = 36
+        self.config.grid_columns = self.config.grid_rows = 2
+        self.config.page_cache_dir = self.tmp_dir.name
+
+    def render(self, name, texts=TEXTS):
+        creator = PdfCreator(self.config)
+        output = Path(self.tmp_dir.name) / name
+        with patch.object(
+            creator, "_compose_page", wraps=creator._compose_page
+        ) as mock_compose, patch("reportlab.rl_config.invariant", 1):
+            creator.generate_pdf(texts, output)
+        return output.read_bytes(), mock_compose.call_count
+
+    def test_unchanged_pages_served_from_cache(self):
+        cold, composed = self.render("cold.pdf")
+        self.assertEqual(composed, 2)
+
+        warm, composed = self.render("warm.pdf")
+        self.assertEqual(composed, 0)
+        self.assertEqual(warm, cold)
+
+    @parameterized.expand(
+        [
+            ("text", lambda config, texts: texts.__setitem__(4, "A1/1-003")),
+            ("init_cell", lambda config, texts: config.set_initial_cell_ordinal(2)),
+            ("color", lambda config, texts: setattr(config, "text_color", "#ff0000")),
+        ]
+    )
+    def test_changed_page_rendered_again(self, _, change):
+        self.render("cold.pdf")
+
+        texts = list(self.TEXTS)
+        change(self.config, texts)
+        _, composed = self.render("changed.pdf", texts)
+        self.assertGreaterEqual(composed, 1)
+
+    def test_cached_pages_display_like_draw_image(self):
+        self.render("cold.pdf")
+        warm, composed = self.render("warm.pdf")
+        self.assertEqual(composed, 0)
+        self.config.page_cache_dir = None
+        public, _ = self.render("public.pdf")
+
+        warm_doc = pymupdf.open(stream=warm, filetype="pdf")
+        public_doc = pymupdf.open(stream=public, filetype="pdf")
+        self.assertEqual(len(warm_doc), len(public_doc))
+        for warm_page, public_page in zip(warm_doc, public_doc):
+            self.assertEqual(
+                warm_page.get_pixmap(dpi=36).samples,
+                public_page.get_pixmap(dpi=36).samples,
+            )
+
+    def test_missing_reportlab_internals_fall_back_to_draw_image(self):
+        with patch("src.tiling._draw_encoded_image", side_effect=AttributeError):
+            pdf, composed = self.render("fallback.pdf")
+        self.assertEqual(composed, 2)
+        self.assertEqual(pdf.count(b"/Subtype /Image"), 2)
+
+    def test_compositing_errors_not_swallowed(self):
+        with patch.object(PdfCreator, "_compose_page", side_effect=AttributeError):
+            with self.assertRaises(AttributeError):
+                self.render("broken.pdf")
+
+    def test_cached_page_round_trip(self):
+        cache = PageCache(Path(self.tmp_dir.name), max_bytes=2**20)
+        creator = PdfCreator(self.config)
+        creator._page_cells = [(0, 0, "A1/1-001")]
+        image = _encode_image(creator._compose_page())
+        cache.store("key", image)
+        self.assertEqual(cache.load("key"), image)
+        self.assertIsNone(cache.load("other"))
+
+
+class TestParallelRasterization(unittest.TestCase):
+    TEXTS = ["A1/1-001", "A1/1-001", None, "A1/1-002", "B2/3-004", "A1/1-001"]
+
+    def design(self, workers):
+        config = sample_design()
+        config.workers = workers
+        config.grid_columns = config.grid_rows = 2
+        return config
+
+    def render(self, workers, texts, output, pool=None):
+        with patch("reportlab.rl_config.invariant", 1):
+            PdfCreator(self.design(workers), pool=pool).generate_pdf(texts, output)
+        return output.read_bytes()
+
+    @parameterized.expand([("sequence", list), ("iterator", iter)])
+    def test_parallel_output_identical_to_serial(self, _, container):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            serial = self.render(1, container(self.TEXTS), Path(tmp_dir) / "s.pdf")
+            parallel = self.render(2, container(self.TEXTS), Path(tmp_dir) / "p.pdf")
+        self.assertEqual(serial, parallel)
+
+    def test_session_pool_kept_until_design_changes(self):
+        pool = StickerPool()
+        self.addCleanup(pool.shutdown)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            serial = self.render(1, self.TEXTS, Path(tmp_dir) / "s.pdf")
+            first = self.render(2, self.TEXTS, Path(tmp_dir) / "1.pdf", pool)
+            executor = pool._executor
+            second = self.render(2, self.TEXTS, Path(tmp_dir) / "2.pdf", pool)
+            self.assertIs(pool._executor, executor)
+            self.assertEqual(first, serial)
+            self.assertEqual(second, serial)
+
+            config = self.design(2)
+            config.text_color = "#ff0000"
+            PdfCreator(config, pool=pool).generate_pdf(
+                self.TEXTS, Path(tmp_dir) / "3.pdf"
+            )
+        self.assertIsNot(pool._executor, executor)
+        self.assertEqual(pool._executor._mp_context.get_start_method(), "forkserver")
+
 
 class TestLayoutCalculation(BasePdfTest):
     def test_layout_values(self):
@@ -166,6 +461,40 @@ class TestLayoutCalculation(BasePdfTest):
         )
 
 
+class TestPlacementPlan(BasePdfTest):
+    def test_first_page_starts_at_initial_cell(self):
+        self.config.set_initial_cell(row=2, col=2)
+        plan = self.creator._placement_plan(self.layout)
+
+        self.assertEqual(len(plan.next_pages), 9)
+        self.assertEqual(plan.first_page, plan.next_pages[4:])
+        self.assertEqual(
+            plan.first_page[0], (1, 1, 100, self.creator.PAGE_HEIGHT - 200)
+        )
+
+    def test_plan_follows_initial_cell(self):
+        plan = self.creator._placement_plan(self.layout)
+        self.assertIs(self.creator._placement_plan(self.layout), plan)
+
+        self.config.set_initial_cell_ordinal(3)
+        self.assertEqual(len(self.creator._placement_plan(self.layout).first_page), 7)
+
+    @parameterized.expand(
+        [
+            (1, 1, 1, 8),
+            (1, 9, 1, 0),
+            (5, 14, 2, 0),
+            (9, 18, 3, 1),
+        ]
+    )
+    def test_statistics(self, ordinal, total_stickers, pages, left):
+        self.config.set_initial_cell_ordinal(ordinal)
+        plan = self.creator._placement_plan(self.layout)
+
+        self.assertEqual(plan.total_pages(total_stickers), pages)
+        self.assertEqual(plan.left_last_page(total_stickers, pages), left)
+
+
 class TestCalculateLeftLastPage(BasePdfTest):
     def setUp(self):
         super().setUp()
@@ -209,3 +538,97 @@ class TestCalculateLeftLastPage(BasePdfTest):
         )
 
         self.assertEqual(left, 0)
+
+
+class TestTemplateResampling(unittest.TestCase):
+    def creator(self, output_dpi):
+        config = sample_design()
+        config.output_dpi = output_dpi
+        return PdfCreator(config)
+
+    def test_template_downsampled_to_output_dpi(self):
+        native = self.creator(None)
+        native_dpi = native.output_dpi
+        creator = self.creator(round(native_dpi / 2))
+
+        width, height = native.sticker_template.size
+        self.assertAlmostEqual(creator.sticker_template.width, width / 2, delta=1)
+        self.assertAlmostEqual(creator.sticker_template.height, height / 2, delta=1)
+        self.assertAlmostEqual(creator.font_size, native.font_size / 2, delta=1)
+        self.assertEqual(
+            creator.build_sticker("A1/1-001").size, creator.sticker_template.size
+        )
+
+    def test_template_never_upsampled(self):
+        native = self.creator(None)
+        creator = self.creator(round(native.output_dpi * 2))
+        self.assertEqual(creator.sticker_template.size, native.sticker_template.size)
+        self.assertEqual(creator.font_size, native.font_size)
+
+
+class TestVectorText(unittest.TestCase):
+    def test_glyph_top_matches_raster(self):
+        config = sample_design()
+        config.render_mode = "vector"
+        creator = PdfCreator(config)
+        text = "A1/1-001"
+
+        raster = Image.new("RGBA", creator.sticker_template.size, (0, 0, 0, 0))
+        creator._fill_sticker_template(text, raster)
+        canvas_ = MagicMock()
+        creator._draw_text(canvas_, text, creator._calculate_layout())
+
+        baseline = canvas_.drawCentredString.call_args.args[1]
+        glyph_top = baseline - creator.font.getbbox(text, anchor="ls")[1]
+        self.assertEqual(raster.height - glyph_top, raster.getbbox()[1])
+
+
+class TestStickerCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.config = sample_design()
+        self.config.sticker_cache_dir = self.tmp_dir.name
+
+    def test_repeated_sticker_served_from_cache(self):
+        expected = PdfCreator(self.config).build_sticker("A1/1-001")
+
+        creator = PdfCreator(self.config)
+        with patch.object(creator, "_fill_sticker_template") as mock_fill:
+            cached = creator.build_sticker("A1/1-001")
+        mock_fill.assert_not_called()
+        self.assertEqual(cached.tobytes(), expected.tobytes())
+        self.assertEqual(cached.mode, expected.mode)
+
+    @parameterized.expand(
+        [
+            ("font_size", 91),
+            ("text_color", "#ff0000"),
+            ("text_y_align", 0.3),
+            ("output_dpi", 150),
+        ]
+    )
+    def test_design_change_invalidates(self, field, value):
+        PdfCreator(self.config).build_sticker("A1/1-001")
+
+        setattr(self.config, field, value)
+        creator = PdfCreator(self.config)
+        with patch.object(
+            creator, "_fill_sticker_template", wraps=creator._fill_sticker_template
+        ) as mock_fill:
+            creator.build_sticker("A1/1-001")
+        mock_fill.assert_called_once()
+
+    def test_least_recently_used_evicted(self):
+        cache = StickerCache(Path(self.tmp_dir.name), "design", max_bytes=12_000)
+        sticker = Image.new("RGBA", (30, 30), "red")
+        for mtime, text in enumerate(["A", "B", "C"]):
+            cache.store(text, sticker)
+            os.utime(cache._path(cache._key(text)), ns=(mtime * 10**9, mtime * 10**9))
+        self.assertIsNotNone(cache.load("A"))
+
+        cache.store("D", sticker)
+
+        self.assertIsNone(cache.load("B"))
+        for text in ["A", "C", "D"]:
+            self.assertIsNotNone(cache.load(text))